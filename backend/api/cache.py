@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.renderers import JSONRenderer
+
+LOCAL_CACHE_SIZE = 256
+SHARED_CACHE_TIMEOUT = 60 * 60 * 24
+# Ограничивает срок, пока в ответе вместо уменьшенных копий картинок,
+# которые ещё создаются, отдаётся оригинал
+RECIPE_CACHE_TIMEOUT = 60 * 10
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кеш в памяти процесса."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+local_cache = LRUCache(LOCAL_CACHE_SIZE)
+
+
+def version_key(name):
+    return f'cache:{name}:version'
+
+
+def get_versions(names):
+    """
+    Текущие версии данных names. Начальное значение берётся из времени,
+    чтобы после вытеснения ключа версия не совпала с одной из прежних.
+    """
+    keys = [version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = {
+        key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            if not cache.add(key, version, SHARED_CACHE_TIMEOUT):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def invalidate(name):
+    """Переводит данные name на новую версию и возвращает её."""
+    try:
+        return cache.incr(version_key(name))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(version_key(name), version, SHARED_CACHE_TIMEOUT)
+        return version
+
+
+def normalize_query(request, allowed=None):
+    """Параметры запроса в одном порядке, без повторов значений."""
+    return urlencode([
+        (key, value)
+        for key in sorted(request.GET)
+        if allowed is None or key in allowed
+        for value in sorted(set(request.GET.getlist(key)))
+    ])
+
+
+def cached_response(request, names, render, query=None,
+                    timeout=SHARED_CACHE_TIMEOUT):
+    """
+    Ответ из кеша, действительный, пока не изменились версии данных
+    names. render вызывается только при промахе и должен вернуть
+    Response; в кеш попадают только успешные ответы. Без общего кеша,
+    см. API_RESPONSE_CACHE, ответ не кешируется.
+    """
+    if not settings.API_RESPONSE_CACHE:
+        return render()
+    if query is None:
+        query = normalize_query(request)
+    versions = ':'.join(map(str, get_versions(names)))
+    # Ответы содержат абсолютные ссылки, поэтому в ключе есть адрес
+    # сайта. Memcached ограничивает длину ключа, поэтому адрес хешируется
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    key = f'response:{versions}:{hashlib.md5(url.encode()).hexdigest()}'
+    entry = local_cache.get(key)
+    if entry is None:
+        entry = cache.get(key)
+        if entry is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+            body = JSONRenderer().render(response.data)
+            entry = (
+                f'"{hashlib.md5(body).hexdigest()}"', body, int(time.time()))
+            cache.set(key, entry, timeout)
+        local_cache.set(key, entry)
+    etag, body, last_modified = entry
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = etag in parse_etags(if_none_match)
+    else:
+        if_modified_since = parse_http_date_safe(
+            request.headers.get('If-Modified-Since'))
+        not_modified = (if_modified_since is not None
+                        and last_modified <= if_modified_since)
+    if not_modified:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ReferenceCacheMixin:
+    """
+    Кеширует JSON-ответы list и retrieve справочника reference_name.
+    Ответ не зависит от пользователя, но токен проверяется как и для
+    остальных эндпоинтов: неверный токен получает 401.
+    """
+    reference_name = None
+
+    def is_cacheable(self, request):
+        return request.accepted_renderer.format == 'json'
+
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        if not self.is_cacheable(request):
+            return parent(request, *args, **kwargs)
+        return cached_response(
+            request, (self.reference_name,),
+            lambda: parent(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super().retrieve
+        if not self.is_cacheable(request):
+            return parent(request, *args, **kwargs)
+        return cached_response(
+            request, (self.reference_name,),
+            lambda: parent(request, *args, **kwargs))
+
+
+class RecipeCacheMixin:
+    """
+    Кеширует JSON-ответы рецептов для анонимных пользователей: для них
+    ответ одинаков. Методы помечаются декоратором anonymous_cache.
+    Список зависит от версии всех рецептов, рецепт — от своей версии,
+    см. api.signals.
+    """
+    cache_query_params = (
+        'author', 'cursor', 'limit', 'page', 'tags', 'tags_mode')
+    cache_names = ('tags', 'ingredients', 'users')
+
+    def is_cacheable(self, request):
+        return (
+            'HTTP_AUTHORIZATION' not in request.META
+            and request.accepted_renderer.format == 'json'
+            and set(request.GET) <= set(self.cache_query_params))
+
+    def get_cache_names(self, pk=None):
+        if pk is None:
+            return ('recipes', *self.cache_names)
+        return (f'recipe:{pk}', *self.cache_names)
+
+
+def anonymous_cache(view):
+    """Отдаёт ответ view анонимным пользователям из кеша."""
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        pk = kwargs.get('pk')
+        if pk is not None:
+            # Версия рецепта сбрасывается по его id, а не по адресу:
+            # /recipes/05/ и /recipes/5/ — один рецепт
+            try:
+                pk = int(pk)
+            except ValueError:
+                return view(self, request, *args, **kwargs)
+        if not self.is_cacheable(request):
+            return view(self, request, *args, **kwargs)
+        return cached_response(
+            request, self.get_cache_names(pk),
+            lambda: view(self, request, *args, **kwargs),
+            query=normalize_query(request, self.cache_query_params),
+            timeout=RECIPE_CACHE_TIMEOUT)
+    return wrapper
@@ -0,0 +1,117 @@
+import csv
+import json
+from itertools import chain
+
+from django.db.models import Case, CharField, F, Sum, Value, When
+from django.http import StreamingHttpResponse
+
+from recipes.models import ShoppingCartIngredient
+
+CHUNK_SIZE = 500
+FILENAME = 'list_shopping'
+
+# Единица измерения: (базовая единица, множитель)
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
+
+
+def get_shopping_list(user):
+    """
+    Суммы ингредиентов из корзины пользователя по заранее посчитанной
+    таблице, с приведением единиц измерения к базовым.
+    """
+    unit_field = 'ingredient__measurement_unit'
+    unit = Case(
+        *(When(**{unit_field: source}, then=Value(target))
+          for source, (target, _) in UNIT_CONVERSIONS.items()),
+        default=F(unit_field),
+        output_field=CharField(),
+    )
+    factor = Case(
+        *(When(**{unit_field: source}, then=Value(multiplier))
+          for source, (_, multiplier) in UNIT_CONVERSIONS.items()),
+        default=Value(1),
+    )
+    return ShoppingCartIngredient.objects.filter(
+        user=user
+    ).annotate(
+        name=F('ingredient__name'),
+        unit=unit,
+    ).values('name', 'unit').annotate(
+        amount=Sum(F('amount') * factor),
+    ).order_by('name', 'unit')
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class TextRenderer:
+    """Список покупок в текстовом виде"""
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def render(self, rows):
+        yield 'Список покупок:\n\n'
+        for row in rows:
+            yield f'{row["name"]} ({row["unit"]}) — {row["amount"]}\n'
+
+
+class CSVRenderer:
+    """Список покупок в формате CSV"""
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def render(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            yield writer.writerow((row['name'], row['unit'], row['amount']))
+
+
+class JSONRenderer:
+    """Список покупок в формате JSON"""
+    extension = 'json'
+    content_type = 'application/json'
+
+    def render(self, rows):
+        yield '['
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps({
+                'name': row['name'],
+                'measurement_unit': row['unit'],
+                'amount': row['amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+RENDERERS = {
+    renderer.extension: renderer
+    for renderer in (TextRenderer, CSVRenderer, JSONRenderer)
+}
+
+
+def shopping_list_response(user, file_format):
+    """
+    Потоковый ответ со списком покупок или None, если корзина пуста.
+    Строки читаются курсором на стороне сервера частями по CHUNK_SIZE.
+    """
+    renderer = RENDERERS[file_format]()
+    rows = get_shopping_list(user).iterator(chunk_size=CHUNK_SIZE)
+    first_row = next(rows, None)
+    if first_row is None:
+        return None
+    response = StreamingHttpResponse(
+        renderer.render(chain((first_row,), rows)),
+        content_type=renderer.content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename={FILENAME}.{renderer.extension}')
+    return response
@@ -1,25 +1,114 @@
+import time
+
+from django import forms
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from .cache import get_versions, local_cache
+from .utils import get_user_recipes
 
+TAG_MODES = ('any', 'all')
+TAG_IDS_TIMEOUT = 60
 
-class IngredientFilter(FilterSet):
-    """Фильтр для ингредиентов"""
-    name = filters.CharFilter(lookup_expr='istartswith')
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+RECIPE_ORDERINGS = {
+    'popular': 'score__popular',
+    'trending': 'score__trending',
+}
+
+
+def get_tag_ids():
+    """
+    Словарь {slug: id} тегов, закешированный до изменения тегов, но не
+    дольше TAG_IDS_TIMEOUT секунд: с кешем в памяти воркера новая
+    версия тегов в другом воркере здесь не видна.
+    """
+    version, = get_versions(('tags',))
+    key = f'tags:ids:{version}'
+    entry = local_cache.get(key)
+    if entry is None or time.monotonic() - entry[0] > TAG_IDS_TIMEOUT:
+        entry = (time.monotonic(), dict(Tag.objects.values_list('slug', 'id')))
+        local_cache.set(key, entry)
+    return entry[1]
+
+
+class SlugsField(forms.MultipleChoiceField):
+    """Список значений без проверки по списку вариантов"""
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugsFilter(filters.Filter):
+    field_class = SlugsField
 
 
 class RecipesFilter(FilterSet):
     """Фильтр для рецептов"""
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
-    is_favorited = filters.BooleanFilter(field_name='favorite__user')
+    tags = SlugsFilter(method='filter_tags')
+    tags_mode = filters.ChoiceFilter(
+        choices=[(mode, mode) for mode in TAG_MODES],
+        method='filter_tags_mode',
+    )
+    is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
-        field_name='shopping_cart__user'
+        method='filter_is_in_shopping_cart'
+    )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in RECIPE_ORDERINGS],
+        method='order_by_score'
     )
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'author', 'tags', 'is_in_shopping_cart']
+        # ordering применяется после search и заменяет сортировку
+        # по релевантности
+        fields = ['is_favorited', 'author', 'tags', 'tags_mode',
+                  'is_in_shopping_cart', 'search', 'ordering']
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Рецепты с любым из тегов value или, при tags_mode=all, со всеми
+        тегами. Один подзапрос EXISTS, поэтому рецепты не повторяются.
+        """
+        tag_ids = get_tag_ids()
+        value = set(value)
+        ids = {tag_ids[slug] for slug in value if slug in tag_ids}
+        all_tags = self.form.cleaned_data.get('tags_mode') == 'all'
+        if not ids or all_tags and len(ids) < len(value):
+            return queryset.none()
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=ids)
+        if all_tags and len(ids) > 1:
+            recipe_tags = recipe_tags.values('recipe_id').annotate(
+                count=Count('tag_id')).filter(count=len(ids))
+        return queryset.filter(Exists(recipe_tags))
+
+    def filter_tags_mode(self, queryset, name, value):
+        """Режим применяется в filter_tags."""
+        return queryset
+
+    def filter_recipe_ids(self, queryset, recipe_ids, value):
+        if value:
+            return queryset.filter(id__in=recipe_ids)
+        return queryset.exclude(id__in=recipe_ids)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_recipe_ids(
+            queryset, get_user_recipes(self.request).favorites, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_recipe_ids(
+            queryset, get_user_recipes(self.request).shopping_cart, value)
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def order_by_score(self, queryset, name, value):
+        return queryset.filter(score__isnull=False).order_by(
+            f'-{RECIPE_ORDERINGS[value]}', '-pub_date', '-id')
@@ -0,0 +1,203 @@
+import json
+import platform
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.metrics import QueryCollector
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingCart, Subscribe, Tag)
+from users.models import User
+
+SEARCH_PREFIXES = ('а', 'мо', 'сах', 'кар', 'мук', 'сол', 'яй', 'пер')
+
+
+class Command(BaseCommand):
+    help = 'Замер времени ответа, числа запросов и памяти для API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--memory-requests', type=int, default=5,
+            help='Запросов на сценарий для замера памяти')
+        parser.add_argument(
+            '--scenario', action='append',
+            help='Запустить только указанные сценарии')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Очищать кеш перед каждым запросом')
+        parser.add_argument(
+            '--enforce-budgets', action='store_true',
+            help='Считать ошибкой превышение query_budget')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчёта в JSON')
+        parser.add_argument(
+            '--compare', help='Отчёт предыдущего запуска для сравнения')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('Нужно не меньше двух запросов на сценарий')
+        self.random = random.Random(options['seed'])
+        self.options = options
+        scenarios = self.get_scenarios()
+        if options['scenario']:
+            unknown = set(options['scenario']) - scenarios.keys()
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = {
+                name: scenarios[name] for name in options['scenario']}
+        with override_settings(
+                QUERY_BUDGET_ENFORCE=options['enforce_budgets']):
+            results = {
+                name: self.run_scenario(name, *scenario)
+                for name, scenario in scenarios.items()
+            }
+        report = {
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': self.get_dataset(),
+            'requests': options['requests'],
+            'cache': not options['no_cache'],
+            'max_rss_kb': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss,
+            'scenarios': results,
+        }
+        if options['compare']:
+            self.compare(report, options['compare'])
+        report = json.dumps(report, ensure_ascii=False, indent=2)
+        if not options['output']:
+            return report
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            file.write(report)
+        return f'Отчёт сохранён в {options["output"]}'
+
+    def get_dataset(self):
+        return {
+            model._meta.model_name: model.objects.count()
+            for model in (User, Recipe, Ingredient, Tag, FavoriteRecipe,
+                          ShoppingCart, Subscribe)
+        }
+
+    def get_scenarios(self):
+        """Сценарий: (пользователь или None, функция, возвращающая URL)."""
+        user = User.objects.filter(
+            following_count__gt=0,
+            shopping_cart__isnull=False,
+        ).order_by('-following_count', 'id').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователя с подписками и списком покупок, '
+                'запустите generate_dataset')
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        slugs = list(Tag.objects.values_list('slug', flat=True))
+        author_ids = list(Recipe.objects.values_list(
+            'author_id', flat=True).distinct().order_by())
+        search_words = [
+            name.split()[0] for name in IngredientAmount.objects.values_list(
+                'ingredient__name', flat=True).distinct()[:50]
+        ] or ['рецепт']
+        return {
+            'recipes_list': (None, lambda: (
+                f'/api/recipes/?page={self.random.randint(1, 5)}&limit=6')),
+            'recipes_list_user': (user, lambda: '/api/recipes/?limit=6'),
+            'recipes_filtered': (user, lambda: (
+                '/api/recipes/?limit=6&is_favorited=0&' + '&'.join(
+                    f'tags={slug}'
+                    for slug in self.random.sample(slugs, min(2, len(slugs)))
+                ))),
+            'recipes_author': (None, lambda: (
+                f'/api/recipes/?limit=6'
+                f'&author={self.random.choice(author_ids)}')),
+            'recipes_search': (None, lambda: (
+                f'/api/recipes/?limit=6'
+                f'&search={self.random.choice(search_words)}')),
+            'recipe_detail': (user, lambda: (
+                f'/api/recipes/{self.random.choice(recipe_ids)}/')),
+            'subscriptions': (user, lambda: (
+                '/api/users/subscriptions/?limit=6&recipes_limit=3')),
+            'ingredient_search': (None, lambda: (
+                f'/api/ingredients/?name='
+                f'{self.random.choice(SEARCH_PREFIXES)}')),
+            'download_shopping_cart': (user, lambda: (
+                '/api/recipes/download_shopping_cart/')),
+        }
+
+    def get_client(self, user):
+        client = Client(raise_request_exception=False)
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        return client
+
+    def request(self, client, url):
+        if self.options['no_cache']:
+            cache.clear()
+        collector = QueryCollector()
+        start = time.perf_counter()
+        with connection.execute_wrapper(collector):
+            response = client.get(url)
+            size = len(b''.join(response) if response.streaming
+                       else response.content)
+        return (time.perf_counter() - start, collector.count,
+                size, response.status_code)
+
+    def run_scenario(self, name, user, get_url):
+        self.stderr.write(f'{name}...')
+        client = self.get_client(user)
+        for _ in range(self.options['warmup']):
+            self.request(client, get_url())
+        durations, queries, sizes, errors = [], [], [], 0
+        for _ in range(self.options['requests']):
+            duration, count, size, status = self.request(client, get_url())
+            durations.append(duration * 1000)
+            queries.append(count)
+            sizes.append(size)
+            errors += status >= 400
+        tracemalloc.start()
+        peaks = []
+        for _ in range(self.options['memory_requests']):
+            tracemalloc.reset_peak()
+            self.request(client, get_url())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        percentiles = statistics.quantiles(
+            durations, n=100, method='inclusive')
+        return {
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'mean_ms': round(statistics.mean(durations), 2),
+            'max_ms': round(max(durations), 2),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+            'size_mean': round(statistics.mean(sizes)),
+            'peak_memory_kb': round(max(peaks, default=0) / 1024),
+            'errors': errors,
+        }
+
+    def compare(self, report, path):
+        with open(path, encoding='utf-8') as file:
+            previous = json.load(file)['scenarios']
+        for name, result in report['scenarios'].items():
+            if name not in previous:
+                continue
+            changes = ', '.join(
+                f'{metric} {previous[name][metric]} → {result[metric]}'
+                for metric in ('p50_ms', 'p95_ms', 'queries_max')
+            )
+            self.stderr.write(f'{name}: {changes}')
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Prefetch
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import RECIPE_FIELDS, FastRecipeSerializer
+from api.serializers import RecipeSerializer
+from recipes.models import IngredientAmount, Recipe, Subscribe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер времени сериализации RecipeSerializer '
+        'и FastRecipeSerializer. Совпадение ответов проверяют тесты '
+        'api.tests.test_fast_serializers')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Рецептов в замере')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            following_count__gt=0).order_by('-following_count', 'id').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователя с подписками, запустите generate_dataset')
+        self.benchmark(user, options['limit'], options['repeat'])
+
+    def get_request(self, user):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        return request
+
+    def benchmark(self, user, limit, repeat):
+        queryset = Recipe.objects.annotate(author_is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('author'))))
+        ids = list(queryset.values_list('id', flat=True)[:limit])
+        queryset = queryset.filter(id__in=ids)
+
+        def serialize():
+            return RecipeSerializer(
+                queryset.select_related('author').prefetch_related(
+                    'tags',
+                    Prefetch(
+                        'recipe',
+                        queryset=IngredientAmount.objects.select_related(
+                            'ingredient')),
+                ),
+                many=True,
+                context={'request': self.get_request(user)},
+            ).data
+
+        def fast_serialize():
+            return FastRecipeSerializer(self.get_request(user)).serialize(
+                queryset.values(*RECIPE_FIELDS))
+
+        for name, function in (('RecipeSerializer', serialize),
+                               ('FastRecipeSerializer', fast_serialize)):
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                JSONRenderer().render(function())
+                durations.append(time.perf_counter() - start)
+            durations.sort()
+            self.stdout.write(
+                f'{name}: {len(ids)} рецептов, медиана '
+                f'{durations[len(durations) // 2] * 1000:.2f} мс, '
+                f'минимум {durations[0] * 1000:.2f} мс')
@@ -0,0 +1,271 @@
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe
+from users.models import User
+
+from .benchmark import SEARCH_PREFIXES
+
+HOST = '127.0.0.1'
+STARTUP_TIMEOUT = 30
+DUMMY_CACHE = 'django.core.cache.backends.dummy.DummyCache'
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность API под gunicorn в режимах WSGI и ASGI '
+        'при одновременных клиентах')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', action='append', choices=('wsgi', 'asgi'),
+            help='Режим сервера, по умолчанию оба')
+        parser.add_argument(
+            '--concurrency', type=int, action='append',
+            help='Одновременных клиентов, по умолчанию 1, 8 и 32')
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на замер')
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Воркеров gunicorn в каждом режиме')
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Клиентов, медленно отправляющих запрос во время замера')
+        parser.add_argument(
+            '--slow-delay', type=float, default=1,
+            help='Пауза медленного клиента перед концом запроса, секунд')
+        parser.add_argument(
+            '--scenario', action='append',
+            help='Запустить только указанные сценарии')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Запустить серверы без кеша')
+        parser.add_argument(
+            '--env', action='append', default=[], metavar='NAME=VALUE',
+            help='Переменная окружения серверов, например DB_POOL_SIZE=4')
+        parser.add_argument('--port', type=int, default=8400)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчёта в JSON')
+
+    def handle(self, *args, **options):
+        self.options = options
+        if any('=' not in item for item in options['env']):
+            raise CommandError('--env задаётся в виде NAME=VALUE')
+        self.env = dict(item.split('=', 1) for item in options['env'])
+        scenarios = self.get_scenarios()
+        if options['scenario']:
+            unknown = set(options['scenario']) - scenarios.keys()
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = {
+                name: scenarios[name] for name in options['scenario']}
+        modes = options['mode'] or ('wsgi', 'asgi')
+        results = {}
+        for offset, mode in enumerate(modes):
+            port = options['port'] + offset
+            with self.server(mode, port):
+                results[mode] = {
+                    name: {
+                        str(concurrency): self.measure(
+                            port, headers, get_url, concurrency)
+                        for concurrency in (
+                            options['concurrency'] or (1, 8, 32))
+                    }
+                    for name, (headers, get_url) in scenarios.items()
+                }
+        self.summary(results)
+        report = json.dumps({
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'workers': options['workers'],
+            'asgi_threads': settings.ASGI_THREADS,
+            'duration': options['duration'],
+            'slow_clients': options['slow_clients'],
+            'cache': not options['no_cache'],
+            'env': self.env,
+            'modes': results,
+        }, ensure_ascii=False, indent=2)
+        if not options['output']:
+            return report
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            file.write(report)
+        return f'Отчёт сохранён в {options["output"]}'
+
+    def get_scenarios(self):
+        """Сценарий: (заголовки запроса, функция, возвращающая URL)."""
+        user = User.objects.filter(
+            following_count__gt=0,
+            shopping_cart__isnull=False,
+        ).order_by('-following_count', 'id').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователя с подписками и списком покупок, '
+                'запустите generate_dataset')
+        token, _ = Token.objects.get_or_create(user=user)
+        authorized = {'Authorization': f'Token {token.key}'}
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        return {
+            'tags': ({}, lambda rng: '/api/tags/'),
+            'ingredient_search': ({}, lambda rng: (
+                f'/api/ingredients/?name='
+                f'{quote(rng.choice(SEARCH_PREFIXES))}')),
+            'recipes_list': ({}, lambda rng: (
+                f'/api/recipes/?page={rng.randint(1, 5)}&limit=6')),
+            'recipes_list_user': (
+                authorized, lambda rng: '/api/recipes/?limit=6'),
+            'recipe_detail': (authorized, lambda rng: (
+                f'/api/recipes/{rng.choice(recipe_ids)}/')),
+            'download_shopping_cart': (authorized, lambda rng: (
+                '/api/recipes/download_shopping_cart/')),
+        }
+
+    @contextmanager
+    def server(self, mode, port):
+        """Запущенный gunicorn в режиме mode."""
+        env = {
+            **os.environ,
+            'SERVER_MODE': mode,
+            'GUNICORN_BIND': f'{HOST}:{port}',
+            'WEB_CONCURRENCY': str(self.options['workers']),
+            **self.env,
+        }
+        if self.options['no_cache']:
+            env['CACHE_BACKEND'] = DUMMY_CACHE
+        self.stderr.write(f'{mode}: запуск gunicorn...')
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn',
+                 '--config', 'gunicorn.conf.py'],
+                cwd=settings.BASE_DIR, env=env,
+                stdout=log, stderr=subprocess.STDOUT)
+            try:
+                self.wait_ready(process, log, port)
+                yield
+            finally:
+                process.terminate()
+                process.wait()
+
+    @staticmethod
+    def wait_ready(process, log, port):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                break
+            try:
+                status, _ = get(port, '/api/tags/', {})
+            except OSError:
+                time.sleep(0.2)
+                continue
+            if status == 200:
+                return
+        log.seek(0)
+        raise CommandError(
+            f'Сервер не запустился:\n{log.read().decode(errors="replace")}')
+
+    def measure(self, port, headers, get_url, concurrency):
+        """
+        concurrency клиентов отправляют запросы друг за другом в течение
+        --duration секунд, каждый запрос в новом соединении.
+        """
+        options = self.options
+        stop = threading.Event()
+        slow_clients = [
+            threading.Thread(target=slow_client, args=(
+                port, options['slow_delay'], stop))
+            for _ in range(options['slow_clients'])
+        ]
+        results = [[] for _ in range(concurrency)]
+        deadline = time.monotonic() + options['duration']
+
+        def client(number):
+            rng = random.Random(options['seed'] + number)
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    status, _ = get(port, get_url(rng), headers)
+                except (OSError, http.client.HTTPException):
+                    status = None
+                results[number].append(
+                    (time.perf_counter() - start, status))
+
+        clients = [
+            threading.Thread(target=client, args=(number,))
+            for number in range(concurrency)
+        ]
+        for thread in slow_clients + clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        stop.set()
+        for thread in slow_clients:
+            thread.join()
+        durations = [
+            duration * 1000 for result in results
+            for duration, status in result if status == 200
+        ]
+        errors = sum(
+            status != 200 for result in results for _, status in result)
+        if len(durations) < 2:
+            return {'rps': 0, 'errors': errors}
+        percentiles = statistics.quantiles(
+            durations, n=100, method='inclusive')
+        return {
+            'rps': round(len(durations) / options['duration'], 1),
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'max_ms': round(max(durations), 2),
+            'errors': errors,
+        }
+
+    def summary(self, results):
+        modes = list(results)
+        for name in next(iter(results.values()), {}):
+            for concurrency in results[modes[0]][name]:
+                line = ', '.join(
+                    f'{mode} {results[mode][name][concurrency]["rps"]} rps '
+                    f'p95 {results[mode][name][concurrency].get("p95_ms")}'
+                    for mode in modes)
+                self.stderr.write(f'{name} x{concurrency}: {line}')
+
+
+def get(port, url, headers):
+    connection = http.client.HTTPConnection(HOST, port, timeout=60)
+    try:
+        connection.request('GET', url, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def slow_client(port, delay, stop):
+    """Отправляет запрос по частям с паузой, занимая соединение."""
+    while not stop.is_set():
+        try:
+            with socket.create_connection((HOST, port), timeout=60) as sock:
+                sock.sendall(
+                    f'GET /api/tags/ HTTP/1.1\r\nHost: {HOST}\r\n'.encode())
+                stop.wait(delay)
+                sock.sendall(b'Connection: close\r\n\r\n')
+                while sock.recv(65536):
+                    pass
+        except OSError:
+            stop.wait(0.1)
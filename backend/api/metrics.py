@@ -0,0 +1,206 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024)
+
+# Метрика: границы корзин гистограммы (время в миллисекундах)
+METRICS = {
+    'queries': QUERY_BUCKETS,
+    'db': TIME_BUCKETS,
+    'view': TIME_BUCKETS,
+    'render': TIME_BUCKETS,
+    'total': TIME_BUCKETS,
+    'size': SIZE_BUCKETS,
+}
+SERVER_TIMINGS = ('db', 'view', 'render', 'total')
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            buckets[str(bound)] = total
+        buckets['+Inf'] = self.count
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+class Metrics:
+    """Гистограммы метрик по вьюсетам и действиям в памяти процесса."""
+
+    def __init__(self):
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint, values):
+        with self.lock:
+            histograms = self.endpoints.get(endpoint)
+            if histograms is None:
+                histograms = self.endpoints[endpoint] = {
+                    name: Histogram(buckets)
+                    for name, buckets in METRICS.items()
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                endpoint: {
+                    name: histogram.as_dict()
+                    for name, histogram in histograms.items()
+                }
+                for endpoint, histograms in sorted(self.endpoints.items())
+            }
+
+
+metrics = Metrics()
+
+
+class QueryCollector:
+    """Считает запросы к базе данных и время их выполнения."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def get_endpoint(view_func, method):
+    """Имя вьюсета и действия, например RecipeViewSet.list."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class MetricsMiddleware:
+    """
+    Записывает для каждого запроса число запросов к базе данных, время
+    работы базы, вьюсета и рендеринга ответа и размер ответа. Время
+    отдаётся в заголовке Server-Timing при DEBUG или персоналу,
+    гистограммы — в api/metrics/.
+    """
+
+    def __init__(self, get_response):
+        if not settings.API_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        request._metrics = {'endpoint': None, 'render': 0.0}
+        start = time.perf_counter()
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        endpoint = request._metrics['endpoint']
+        if endpoint is None:
+            return response
+        render = request._metrics['render']
+        values = {
+            'queries': collector.count,
+            'db': collector.duration * 1000,
+            'view': max(total - collector.duration - render, 0) * 1000,
+            'render': render * 1000,
+            'total': total * 1000,
+        }
+        if self.is_timing_visible(request):
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={values[name]:.1f}' for name in SERVER_TIMINGS
+            ) + f', queries;desc="{collector.count}"'
+        if response.streaming:
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, endpoint, values)
+        else:
+            values['size'] = len(response.content)
+            metrics.observe(endpoint, values)
+        return response
+
+    @staticmethod
+    def is_timing_visible(request):
+        """Время работы базы и число запросов видны только персоналу."""
+        if settings.DEBUG:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics['endpoint'] = get_endpoint(
+            view_func, request.method.lower())
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._metrics['render'] = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def measure_stream(content, endpoint, values):
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        values['size'] = size
+        metrics.observe(endpoint, values)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """
+    Ограничивает число запросов к базе данных в действии вьюсета.
+    Проверяется только при QUERY_BUDGET_ENFORCE, например в тестах.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.QUERY_BUDGET_ENFORCE:
+                return method(self, request, *args, **kwargs)
+            collector = QueryCollector()
+            with connection.execute_wrapper(collector):
+                response = method(self, request, *args, **kwargs)
+            if collector.count > limit:
+                raise QueryBudgetExceeded(
+                    f'{type(self).__name__}.{self.action}: '
+                    f'{collector.count} запросов, допустимо {limit}')
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
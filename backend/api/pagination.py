@@ -1,7 +1,202 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.services import count_feed, get_feed, get_prolific_authors
+
+KEYSET_PAGE_SIZE = 6
+COUNT_CACHE_TIMEOUT = 60
 
 
 class CustomPageNumberPagination(PageNumberPagination):
-    """Кастомный пагинатор."""
+    """
+    Кастомный пагинатор.
+    Если задан keyset_ordering, параметр cursor включает постраничный
+    вывод по ключу вместо OFFSET. Формат ответа при этом не меняется.
+    """
 
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    keyset_ordering = None
+    keyset_by_default = False
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_keyset_ordering(self, request):
+        return self.keyset_ordering
+
+    def uses_keyset(self, request):
+        return (
+            self.get_keyset_ordering(request) is not None
+            and (self.keyset_by_default
+                 or self.cursor_query_param in request.query_params))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.uses_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.count = self.get_cached_count(queryset)
+        return self.paginate_keyset(queryset, request)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data),
+        ]))
+
+    def get_cached_count(self, queryset):
+        """Количество объектов, закешированное на COUNT_CACHE_TIMEOUT."""
+        try:
+            query = str(queryset.order_by().query).encode()
+        except EmptyResultSet:
+            return 0
+        key = f'pagination:count:{hashlib.md5(query).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def paginate_keyset(self, queryset, request):
+        page_size = self.get_page_size(request) or KEYSET_PAGE_SIZE
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse, values = (False, None)
+        if cursor:
+            reverse, values = self.decode_cursor(queryset.model, cursor)
+        ordering = self.keyset_ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        results = list(self.get_keyset_page(
+            queryset, ordering, reverse, values, page_size + 1))
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+        self.next_link = self.previous_link = None
+        if results and (has_more or reverse):
+            self.next_link = self.encode_link(False, results[-1])
+        if results and values is not None and (has_more or not reverse):
+            self.previous_link = self.encode_link(True, results[0])
+        return results
+
+    def get_keyset_page(self, queryset, ordering, reverse, values, limit):
+        """Не больше limit объектов после values в порядке ordering."""
+        if values is not None:
+            queryset = queryset.filter(self.after(ordering, values))
+        return queryset.order_by(*ordering)[:limit]
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, values):
+        """Условие «строго после values» для заданной сортировки."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    @staticmethod
+    def get_value(instance, field):
+        """Значение поля объекта или строки .values()."""
+        if isinstance(instance, dict):
+            return instance[field]
+        return getattr(instance, field)
+
+    def encode_link(self, reverse, instance):
+        values = [self.get_value(instance, field.lstrip('-'))
+                  for field in self.keyset_ordering]
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            [int(reverse), values], default=str).encode()).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, model, cursor):
+        try:
+            reverse, values = json.loads(base64.urlsafe_b64decode(
+                cursor.encode()).decode())
+            if len(values) != len(self.keyset_ordering):
+                raise ValueError
+            return bool(reverse), [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.keyset_ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class RecipePagination(CustomPageNumberPagination):
+    """
+    Пагинатор рецептов. При сортировке по рейтингу (ordering)
+    и при поиске (search) используется постраничный вывод по номеру
+    страницы.
+    """
+
+    keyset_ordering = ('-pub_date', '-id')
+
+    def get_keyset_ordering(self, request):
+        if (request.query_params.get('ordering')
+                or request.query_params.get('search')):
+            return None
+        return self.keyset_ordering
+
+
+class FeedPagination(RecipePagination):
+    """
+    Пагинатор ленты подписок, по умолчанию постраничный вывод по ключу.
+    Выбирает рецепты ленты из queryset, см. recipes.services.get_feed.
+    """
+
+    keyset_by_default = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.prolific_authors = get_prolific_authors(request.user)
+        if not self.uses_keyset(request):
+            queryset = get_feed(
+                request.user, queryset, self.prolific_authors)
+        return super().paginate_queryset(queryset, request, view)
+
+    @staticmethod
+    def is_filtered(queryset):
+        # Запрос рецептов без фильтров не содержит условий
+        return bool(queryset.query.where)
+
+    def get_cached_count(self, queryset):
+        if self.is_filtered(queryset):
+            return super().get_cached_count(get_feed(
+                self.request.user, queryset, self.prolific_authors))
+        return count_feed(self.request.user, self.prolific_authors)
+
+    def get_keyset_page(self, queryset, ordering, reverse, values, limit):
+        # Фильтры отбрасывают часть рецептов ленты, поэтому с ними
+        # источники ленты не ограничиваются размером страницы
+        queryset = get_feed(
+            self.request.user, queryset, self.prolific_authors,
+            (reverse, values),
+            None if self.is_filtered(queryset) else limit)
+        return queryset.order_by(*ordering)[:limit]
+
+
+class SubscribePagination(CustomPageNumberPagination):
+    """Пагинатор подписок."""
+
+    keyset_ordering = ('-created', '-id')
@@ -1,15 +1,20 @@
 import re
-import base64
 
 from django.contrib.auth.hashers import check_password
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import (PasswordSerializer, UserCreateSerializer,
                                 UserSerializer)
 from rest_framework import serializers
 
+from recipes.constants import (BULK_RECIPES_LIMIT, MATCH_INGREDIENTS_LIMIT,
+                               MATCH_MISSING_LIMIT)
+from recipes.images import ImageError, read_image, rendition_urls
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
                             Recipe, ShoppingCart, Subscribe, Tag)
+from recipes.services import update_recipe_in_shopping_carts
 from users.models import User
+from .utils import get_recipes_limit, get_user_recipes
 
 
 class UserSerializer(UserSerializer):
@@ -22,6 +27,8 @@ class UserSerializer(UserSerializer):
                   'first_name', 'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return (self.context.get('request').user.is_authenticated
                 and Subscribe.objects.filter(
                     user=self.context.get('request').user,
@@ -92,13 +99,38 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор для декодирования картинки"""
+    """
+    Сериализатор для декодирования картинки.
+    Возвращает проверенную картинку, которая сохраняется в хранилище
+    только после проверки всего рецепта, см. recipes.images.ImageUpload.
+    """
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            img_format, img_str = data.split(';base64,')
-            ext = img_format.split('/')[-1]
-            data = ContentFile(base64.b64decode(img_str), name='temp.' + ext)
-        return super().to_internal_value(data)
+            _, _, data = data.partition(';base64,')
+        elif isinstance(data, str) or not hasattr(data, 'chunks'):
+            self.fail('invalid')
+        try:
+            return read_image(data)
+        except ImageError as error:
+            raise serializers.ValidationError(str(error))
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """Адреса уменьшенных копий картинки рецепта"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        urls = rendition_urls(value.name)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return {
+            rendition: request.build_absolute_uri(url)
+            for rendition, url in urls.items()
+        }
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -116,6 +148,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True,
     )
     image = Base64ImageField()
+    images = ImageRenditionsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -123,19 +156,22 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
-            'name', 'image', 'text', 'cooking_time',
+            'name', 'image', 'images', 'text', 'cooking_time',
             'is_favorited', 'is_in_shopping_cart',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
-        return (self.context.get('request').user.is_authenticated
-                and obj.favorite.exists()
-                )
+        return obj.id in get_user_recipes(
+            self.context.get('request')).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        return (self.context.get('request').user.is_authenticated
-                and obj.shopping_cart.exists()
-                )
+        return obj.id in get_user_recipes(
+            self.context.get('request')).shopping_cart
 
 
 class IngredientsEditSerializer(serializers.ModelSerializer):
@@ -171,13 +207,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'name': 'Название рецепта минимум 4 символа'})
         ingredients = data.get('ingredients')
-        for ingredient in ingredients:
-            if not Ingredient.objects.filter(
-                    id=ingredient['id']).exists():
+        ingredient_ids = [item['id'] for item in ingredients]
+        existing_ids = set(Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', flat=True))
+        for ingredient_id in ingredient_ids:
+            if ingredient_id not in existing_ids:
                 raise serializers.ValidationError({
-                    'ingredients': f'Ингредиента с id - {ingredient["id"]} нет'
+                    'ingredients': f'Ингредиента с id - {ingredient_id} нет'
                 })
-        if len(ingredients) != len(set([item['id'] for item in ingredients])):
+        if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться!')
         tags = data.get('tags')
@@ -197,34 +235,81 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            IngredientAmount.objects.bulk_create([
-                IngredientAmount(
-                    recipe=recipe,
-                    ingredient_id=ingredient.get('id'),
-                    amount=ingredient.get('amount'),)
-            ])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe,
+                ingredient_id=ingredient.get('id'),
+                amount=ingredient.get('amount'),)
+            for ingredient in ingredients
+        )
 
+    def update_ingredients(self, ingredients, recipe):
+        """Изменяет только добавленные, изменённые и удалённые строки."""
+        current = {
+            amount.ingredient_id: amount
+            for amount in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: amount.amount
+            for ingredient_id, amount in current.items()
+        }
+        new_amounts = {
+            ingredient.get('id'): ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        removed = current.keys() - new_amounts.keys()
+        if removed:
+            IngredientAmount.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            if ingredient_id in current and current[
+                    ingredient_id].amount != amount:
+                current[ingredient_id].amount = amount
+                changed.append(current[ingredient_id])
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            [ingredient for ingredient in ingredients
+             if ingredient.get('id') not in current],
+            recipe)
+        update_recipe_in_shopping_carts(recipe.id, old_amounts, new_amounts)
+
+    def save_image(self, validated_data):
+        if 'image' in validated_data:
+            validated_data['image'] = validated_data['image'].save()
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        self.save_image(validated_data)
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredients(ingredients, instance)
+            self.update_ingredients(
+                validated_data.pop('ingredients'), instance)
         if 'tags' in validated_data:
             instance.tags.set(
                 validated_data.pop('tags'))
+        self.save_image(validated_data)
         return super().update(
             instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            (instance,),
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient')),
+        )
         return RecipeSerializer(
             instance,
             context={
@@ -234,10 +319,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
 class SubscribeRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор рецептов на которые подписаны"""
+    images = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -259,7 +345,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
         read_only=True)
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='author.recipe.count')
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = Subscribe
@@ -278,12 +364,17 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return data
 
     def get_recipes(self, obj):
-        recipes = obj.author.recipe.all()
-        return SubscribeRecipeSerializer(recipes, many=True).data
+        recipes = getattr(obj.author, 'recipes_preview', None)
+        if recipes is None:
+            recipes = obj.author.recipe.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
+        return SubscribeRecipeSerializer(
+            recipes, many=True, context=self.context).data
 
     def get_is_subscribed(self, obj):
-        return Subscribe.objects.filter(user=self.context.get('request').user,
-                                        author=obj.author).exists()
+        return obj.user_id == self.context.get('request').user.id
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
@@ -344,3 +435,26 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'errors': 'Рецепт уже добавлен в список покупок'})
         return data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для массовых операций"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT,
+    )
+
+
+class RecipeMatchSerializer(serializers.Serializer):
+    """Сериализатор параметров подбора рецептов по ингредиентам"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MATCH_INGREDIENTS_LIMIT,
+    )
+    missing = serializers.IntegerField(
+        min_value=0,
+        max_value=MATCH_MISSING_LIMIT,
+        default=0,
+    )
@@ -0,0 +1,53 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+from .cache import invalidate
+
+# Поля пользователя, которые не выводятся в ответах
+HIDDEN_USER_FIELDS = {'last_login', 'password'}
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    invalidate('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    invalidate('tags')
+
+
+def invalidate_recipe(recipe_id):
+    invalidate('recipes')
+    invalidate(f'recipe:{recipe_id}')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipes(sender, instance, **kwargs):
+    invalidate_recipe(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    invalidate_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        invalidate('recipes')
+        for recipe_id in kwargs['pk_set'] or ():
+            invalidate(f'recipe:{recipe_id}')
+    else:
+        invalidate_recipe(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_users(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= HIDDEN_USER_FIELDS:
+        return
+    invalidate('users')
@@ -0,0 +1,48 @@
+from django.test import TestCase, override_settings
+
+from .utils import RecipesDataMixin
+
+
+@override_settings(API_RESPONSE_CACHE=False)
+class FastSerializerParityTests(RecipesDataMixin, TestCase):
+    """
+    Ответы с FastRecipeSerializer совпадают побайтно с ответами
+    сериализаторов DRF для анонимного пользователя и пользователя
+    с подписками, избранным и списком покупок.
+    """
+
+    def get_urls(self):
+        urls = [
+            '/api/recipes/?limit=100',
+            '/api/recipes/?limit=6',
+            '/api/recipes/?limit=6&page=2',
+            '/api/recipes/?limit=6&cursor=',
+            '/api/recipes/?limit=6&is_favorited=1',
+            '/api/recipes/?limit=6&is_in_shopping_cart=1',
+            '/api/recipes/?limit=6&ordering=popular',
+            '/api/recipes/?limit=6&search=рецепт',
+            f'/api/recipes/?limit=6&author={self.users[1].id}',
+            '/api/recipes/?limit=6&tags=tag1&tags=tag2&tags_mode=all',
+            '/api/recipes/feed/?limit=6',
+            '/api/recipes/cook/?ingredients={}&missing=2'.format(
+                self.ingredients[0].id),
+            '/api/users/subscriptions/?limit=6&recipes_limit=2',
+            '/api/recipes/0/',
+            '/api/recipes/abc/',
+        ]
+        urls += [f'/api/recipes/?limit=6&tags={tag.slug}' for tag in self.tags]
+        urls += [f'/api/recipes/{recipe.id}/' for recipe in self.recipes]
+        return urls
+
+    def get_response(self, client, url, fast):
+        with self.settings(API_FAST_SERIALIZERS=fast):
+            response = client.get(url)
+        return response.status_code, response.content
+
+    def test_responses_are_identical(self):
+        for client in (self.get_client(), self.get_client(self.user)):
+            for url in self.get_urls():
+                with self.subTest(url=url, user=client._credentials):
+                    self.assertEqual(
+                        self.get_response(client, url, True),
+                        self.get_response(client, url, False))
@@ -0,0 +1,27 @@
+from django.test import TestCase, override_settings
+
+from users.models import User
+from .utils import RecipesDataMixin
+
+
+class ServerTimingTests(RecipesDataMixin, TestCase):
+    """Заголовок Server-Timing отдаётся только при DEBUG или персоналу."""
+    url = '/api/recipes/?limit=6'
+
+    def test_hidden_from_users(self):
+        for client in (self.get_client(), self.get_client(self.user)):
+            response = client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Server-Timing', response)
+
+    def test_visible_to_staff(self):
+        staff = User.objects.create_user(
+            username='staff', email='staff@foodgram.ru',
+            password='Password-12345', is_staff=True)
+        response = self.get_client(staff).get(self.url)
+        self.assertIn('queries;desc=', response['Server-Timing'])
+
+    @override_settings(DEBUG=True)
+    def test_visible_in_debug(self):
+        response = self.get_client().get(self.url)
+        self.assertIn('db;dur=', response['Server-Timing'])
@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+
+from recipes.models import Recipe, Subscribe
+from .utils import RecipesDataMixin
+
+
+@override_settings(API_RESPONSE_CACHE=False)
+class KeysetPaginationTests(RecipesDataMixin, TestCase):
+    """Постраничный вывод по курсору и переход на вывод по номеру."""
+
+    def walk(self, client, url, link):
+        """Страницы по ссылкам link начиная с url: списки id."""
+        pages = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.data['results']])
+            url = response.data[link]
+        return pages, response.data
+
+    def assert_round_trip(self, client, url, expected):
+        pages, last = self.walk(client, url, 'next')
+        self.assertEqual(last['count'], len(expected))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(pages))
+        previous_pages, _ = self.walk(client, last['previous'], 'previous')
+        self.assertEqual(previous_pages, pages[-2::-1])
+
+    def test_recipes(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        self.assert_round_trip(
+            self.get_client(), '/api/recipes/?limit=5&cursor=', expected)
+
+    def test_subscriptions(self):
+        client = self.get_client(self.user)
+        expected = list(Subscribe.objects.filter(
+            user=self.user).order_by('-created', '-id').values_list(
+            'author_id', flat=True))
+        self.assert_round_trip(
+            client, '/api/users/subscriptions/?limit=2&cursor=', expected)
+
+    def test_page_numbers_with_ordering_or_search(self):
+        client = self.get_client()
+        for params in ('ordering=popular', 'search=рецепт'):
+            with self.subTest(params=params):
+                response = client.get(
+                    f'/api/recipes/?limit=5&cursor=&{params}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['count'], 12)
+                self.assertIn('page=2', response.data['next'])
+                self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        for cursor in ('abc', 'WzBd', 'WzAsIFsxXV0='):
+            with self.subTest(cursor=cursor):
+                response = self.get_client().get(
+                    f'/api/recipes/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
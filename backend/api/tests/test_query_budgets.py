@@ -0,0 +1,49 @@
+from django.test import TestCase, override_settings
+
+from .utils import RecipesDataMixin
+
+# Запросы горячих действий: (описание, пользователь, адрес)
+HOT_REQUESTS = (
+    ('Список рецептов', False, '/api/recipes/?limit=6'),
+    ('Список рецептов по тегам', False,
+     '/api/recipes/?tags=tag0&tags=tag1&limit=6'),
+    ('Список рецептов по всем тегам', True,
+     '/api/recipes/?tags=tag0&tags=tag1&tags_mode=all'),
+    ('Поиск рецептов', True, '/api/recipes/?search=рецепт'),
+    ('Рецепты по популярности', False, '/api/recipes/?ordering=popular'),
+    ('Рецепты пользователя', True, '/api/recipes/?limit=6'),
+    ('Избранное', True, '/api/recipes/?is_favorited=1'),
+    ('Список покупок', True, '/api/recipes/?is_in_shopping_cart=1'),
+    ('Постраничный вывод по курсору', True, '/api/recipes/?cursor='),
+    ('Рецепт', False, '/api/recipes/{recipe}/'),
+    ('Рецепт для пользователя', True, '/api/recipes/{recipe}/'),
+    ('Лента подписок', True, '/api/recipes/feed/'),
+    ('Подписки', True, '/api/users/subscriptions/?limit=6&recipes_limit=3'),
+)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True, API_RESPONSE_CACHE=False)
+class QueryBudgetTests(RecipesDataMixin, TestCase):
+    """
+    Горячие действия укладываются в query_budget: при превышении
+    QueryBudgetExceeded пробрасывается из тестового клиента.
+    """
+
+    def assert_within_budgets(self):
+        clients = {
+            False: self.get_client(),
+            True: self.get_client(self.user),
+        }
+        for description, authorized, url in HOT_REQUESTS:
+            with self.subTest(description):
+                response = clients[authorized].get(
+                    url.format(recipe=self.recipes[1].id))
+                self.assertEqual(response.status_code, 200)
+
+    def test_fast_serializers(self):
+        with self.settings(API_FAST_SERIALIZERS=True):
+            self.assert_within_budgets()
+
+    def test_drf_serializers(self):
+        with self.settings(API_FAST_SERIALIZERS=False):
+            self.assert_within_budgets()
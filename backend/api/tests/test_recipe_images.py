@@ -0,0 +1,106 @@
+import base64
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.images import (create_renditions, pending, rendition_names,
+                            rendition_urls)
+from recipes.models import Recipe
+from .utils import RecipesDataMixin
+
+
+def make_image():
+    output = BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(output, 'PNG')
+    return base64.b64encode(output.getvalue()).decode()
+
+
+class RecipeImageTests(RecipesDataMixin, TestCase):
+    """Картинка сохраняется только после проверки всего рецепта."""
+    url = '/api/recipes/'
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.wait_renditions)
+        cache.clear()
+
+    @staticmethod
+    def wait_renditions():
+        for future in list(pending.values()):
+            future.result()
+
+    def get_data(self, image, ingredient_id):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [self.tags[0].id],
+            'ingredients': [{'id': ingredient_id, 'amount': 5}],
+            'image': f'data:image/png;base64,{image}',
+        }
+
+    def get_stored_files(self):
+        return [
+            name for _, _, names in os.walk(self.media_root) for name in names
+        ]
+
+    def test_invalid_recipe_stores_nothing(self):
+        response = self.get_client(self.user).post(
+            self.url, self.get_data(make_image(), 0), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_stored_files(), [])
+
+    def test_base64_with_line_breaks(self):
+        image = make_image()
+        image = '\n'.join(image[start:start + 16]
+                          for start in range(0, len(image), 16))
+        response = self.get_client(self.user).post(
+            self.url,
+            self.get_data(image, self.ingredients[0].id), format='json')
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(id=response.data['id'])
+        self.assertIn(os.path.basename(recipe.image.name),
+                      self.get_stored_files())
+
+    def test_subscription_image_urls_are_absolute(self):
+        response = self.get_client(self.user).get(
+            '/api/users/subscriptions/?limit=6&recipes_limit=1')
+        self.assertEqual(response.status_code, 200)
+        for author in response.data['results']:
+            for recipe in author['recipes']:
+                for url in recipe['images'].values():
+                    self.assertTrue(url.startswith('http://'), url)
+
+    def test_renditions_created_by_other_process(self):
+        image = base64.b64decode(make_image())
+        name = default_storage.save(
+            'recipes/images/other.png', ContentFile(image))
+        original = default_storage.url(name)
+        self.assertEqual(
+            set(rendition_urls(name).values()), {original})
+        # Копии создала команда create_image_renditions
+        create_renditions(name)
+        self.assertEqual(rendition_urls(name), {
+            rendition: default_storage.url(path)
+            for rendition, path in rendition_names(name).items()
+        })
+
+    def test_failed_renditions(self):
+        name = default_storage.save(
+            'recipes/images/broken.png', ContentFile(b'broken'))
+        with self.assertRaises(OSError):
+            create_renditions(name)
+        self.assertEqual(
+            set(rendition_urls(name).values()),
+            {default_storage.url(name)})
@@ -0,0 +1,63 @@
+from django.test import TestCase
+
+from recipes.models import IngredientAmount, ShoppingCartIngredient
+from recipes.services import calculate_shopping_cart_totals
+from .utils import RecipesDataMixin
+
+
+class RecipeUpdateTests(RecipesDataMixin, TestCase):
+    """
+    Изменение рецепта меняет только изменённые строки ингредиентов
+    и переносит разницу в суммы списков покупок.
+    """
+
+    def test_update_ingredients(self):
+        recipe = self.recipes[4]
+        kept, changed, removed = self.ingredients[4:7]
+        added = self.ingredients[7]
+        rows = {
+            amount.ingredient_id: amount.id
+            for amount in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        response = self.get_client(self.user).patch(
+            f'/api/recipes/{recipe.id}/', {
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'tags': [self.tags[0].id],
+                'ingredients': [
+                    {'id': kept.id, 'amount': 10},
+                    {'id': changed.id, 'amount': 20},
+                    {'id': added.id, 'amount': 3},
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        amounts = {
+            amount.ingredient_id: amount
+            for amount in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        self.assertEqual(
+            {ingredient_id: amount.amount
+             for ingredient_id, amount in amounts.items()},
+            {kept.id: 10, changed.id: 20, added.id: 3})
+        self.assertEqual(amounts[kept.id].id, rows[kept.id])
+        self.assertEqual(amounts[changed.id].id, rows[changed.id])
+        self.assertNotIn(removed.id, amounts)
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount')),
+            set(calculate_shopping_cart_totals()))
+
+    def test_unknown_ingredient(self):
+        recipe = self.recipes[4]
+        response = self.get_client(self.user).patch(
+            f'/api/recipes/{recipe.id}/', {
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'tags': [self.tags[0].id],
+                'ingredients': [{'id': 0, 'amount': 1}],
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            IngredientAmount.objects.filter(recipe=recipe).count(), 3)
@@ -0,0 +1,30 @@
+from django.test import TestCase, override_settings
+
+from users.models import User
+from .utils import RecipesDataMixin
+
+
+@override_settings(API_RESPONSE_CACHE=True)
+class ReferenceCacheTests(RecipesDataMixin, TestCase):
+    """Кешированные справочники проверяют токен и видны персоналу."""
+    urls = ('/api/tags/', '/api/ingredients/')
+
+    def test_invalid_token(self):
+        client = self.get_client()
+        client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get_client().get(url).status_code, 200)
+                self.assertEqual(client.get(url).status_code, 401)
+
+    def test_server_timing_for_staff(self):
+        staff = User.objects.create_user(
+            username='staff', email='staff@foodgram.ru',
+            password='Password-12345', is_staff=True)
+        client = self.get_client(staff)
+        for url in self.urls:
+            with self.subTest(url=url):
+                for _ in range(2):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn('Server-Timing', response)
@@ -0,0 +1,86 @@
+import json
+
+from django.test import TestCase
+
+from recipes.models import (Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart)
+from users.models import User
+from .utils import RecipesDataMixin
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListExportTests(TestCase):
+    """Выгрузка списка покупок в txt, csv и json с приведением единиц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@foodgram.ru',
+            password='Password-12345')
+        ingredients = {
+            (name, unit): Ingredient.objects.create(
+                name=name, measurement_unit=unit)
+            for name, unit in (('Мука', 'кг'), ('Мука', 'г'),
+                               ('Молоко', 'л'), ('Соль', 'г'))
+        }
+        recipes = [
+            {('Мука', 'кг'): 1, ('Молоко', 'л'): 2, ('Соль', 'г'): 3},
+            {('Мука', 'г'): 200, ('Соль', 'г'): 2},
+        ]
+        for number, amounts in enumerate(recipes):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png')
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(
+                    recipe=recipe, ingredient=ingredients[key], amount=amount)
+                for key, amount in amounts.items())
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def download(self, file_format=None, user=None):
+        client = RecipesDataMixin.get_client(user or self.user)
+        params = {'file_format': file_format} if file_format else {}
+        return client.get(URL, params)
+
+    def get_content(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_txt(self):
+        response = self.download()
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename=list_shopping.txt')
+        self.assertEqual(self.get_content(response), (
+            'Список покупок:\n\n'
+            'Молоко (мл) — 2000\n'
+            'Мука (г) — 1200\n'
+            'Соль (г) — 5\n'))
+
+    def test_csv(self):
+        response = self.download('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(self.get_content(response).splitlines(), [
+            'name,measurement_unit,amount',
+            'Молоко,мл,2000',
+            'Мука,г,1200',
+            'Соль,г,5',
+        ])
+
+    def test_json(self):
+        response = self.download('json')
+        self.assertEqual(json.loads(self.get_content(response)), [
+            {'name': 'Молоко', 'measurement_unit': 'мл', 'amount': 2000},
+            {'name': 'Мука', 'measurement_unit': 'г', 'amount': 1200},
+            {'name': 'Соль', 'measurement_unit': 'г', 'amount': 5},
+        ])
+
+    def test_errors(self):
+        self.assertEqual(self.download('pdf').status_code, 400)
+        empty = User.objects.create_user(
+            username='empty', email='empty@foodgram.ru',
+            password='Password-12345')
+        self.assertEqual(self.download(user=empty).status_code, 400)
+        self.assertEqual(
+            RecipesDataMixin.get_client().get(URL).status_code, 401)
@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from recipes.models import Recipe
+from .utils import RecipesDataMixin
+
+
+class RecipesLimitTests(RecipesDataMixin, TestCase):
+    """recipes_limit ограничивает рецепты авторов в подписках."""
+
+    def get_recipe_ids(self, author):
+        return list(Recipe.objects.filter(
+            author_id=author['id']).values_list('id', flat=True))
+
+    def test_subscriptions(self):
+        client = self.get_client(self.user)
+        for recipes_limit, expected in (('2', 2), ('', 3), ('0', 3),
+                                        ('abc', 3)):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = client.get(
+                    '/api/users/subscriptions/',
+                    {'limit': 6, 'recipes_limit': recipes_limit})
+                self.assertEqual(response.status_code, 200)
+                authors = response.data['results']
+                self.assertEqual(len(authors), self.users_count - 1)
+                for author in authors:
+                    self.assertEqual(author['recipes_count'], 3)
+                    self.assertEqual(
+                        [recipe['id'] for recipe in author['recipes']],
+                        self.get_recipe_ids(author)[:expected])
+
+    def test_subscribe(self):
+        author = self.users[2]
+        response = self.get_client(self.users[1]).post(
+            f'/api/users/{author.id}/subscribe/?recipes_limit=1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['recipes']],
+            self.get_recipe_ids(response.data)[:1])
@@ -0,0 +1,71 @@
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingCart, Subscribe, Tag)
+from recipes.search import update_search_documents
+from users.models import User
+
+
+class RecipesDataMixin:
+    """
+    Пользователи с подписками, рецепты с тегами и ингредиентами,
+    избранное и список покупок. Данные создаются через модели, поэтому
+    счётчики и ленты заполняются сигналами. Поисковые документы
+    обновляются после фиксации транзакции, которой в TestCase нет,
+    поэтому строятся явно.
+    """
+    users_count = 4
+    recipes_count = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', slug=f'tag{number}',
+                color=f'#00000{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(8)
+        ]
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@foodgram.ru',
+                password='Password-12345', first_name='Имя',
+                last_name='Фамилия')
+            for number in range(cls.users_count)
+        ]
+        cls.recipes = []
+        for number in range(cls.recipes_count):
+            recipe = Recipe.objects.create(
+                author=cls.users[number % cls.users_count],
+                name=f'Рецепт {number}', text='Описание', cooking_time=10,
+                image='recipes/images/recipe.png')
+            recipe.tags.set(cls.tags[:number % len(cls.tags) + 1])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(
+                    recipe=recipe, amount=10 + offset,
+                    ingredient=cls.ingredients[
+                        (number + offset) % len(cls.ingredients)])
+                for offset in range(3)
+            )
+            cls.recipes.append(recipe)
+        cls.user = cls.users[0]
+        for author in cls.users[1:]:
+            Subscribe.objects.create(user=cls.user, author=author)
+        for recipe in cls.recipes[1:6]:
+            FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        update_search_documents()
+
+    @staticmethod
+    def get_client(user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import (FavoriteRecipeViewSet, IngredientViewSet, RecipeViewSet,
+from .views import (DatabaseMetricsView, FavoriteRecipeViewSet,
+                    IngredientViewSet, MetricsView, RecipeViewSet,
                     ShoppingCartViewSet, SubscribeViewSet, TagViewSet,
                     UserViewSet)
 
@@ -21,6 +22,8 @@ router.register(
     basename='shoppingcart')
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('metrics/db/', DatabaseMetricsView.as_view(), name='metrics-db'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
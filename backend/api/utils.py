@@ -0,0 +1,56 @@
+from django.db.models import Value
+from django.utils.functional import cached_property
+
+from recipes.models import FavoriteRecipe, ShoppingCart
+
+FAVORITE = 'favorite'
+SHOPPING_CART = 'shopping_cart'
+
+
+class UserRecipes:
+    """
+    Множества id рецептов текущего пользователя в избранном
+    и в списке покупок. Загружаются одним запросом на весь запрос.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def _recipe_ids(self):
+        recipe_ids = {FAVORITE: set(), SHOPPING_CART: set()}
+        if not self.user.is_authenticated:
+            return recipe_ids
+        favorite = FavoriteRecipe.objects.filter(user=self.user).annotate(
+            kind=Value(FAVORITE)).values_list('recipe_id', 'kind')
+        shopping_cart = ShoppingCart.objects.filter(
+            user=self.user).annotate(
+                kind=Value(SHOPPING_CART)).values_list('recipe_id', 'kind')
+        for recipe_id, kind in favorite.union(shopping_cart, all=True):
+            recipe_ids[kind].add(recipe_id)
+        return recipe_ids
+
+    @property
+    def favorites(self):
+        return self._recipe_ids[FAVORITE]
+
+    @property
+    def shopping_cart(self):
+        return self._recipe_ids[SHOPPING_CART]
+
+
+def get_user_recipes(request):
+    """Возвращает закешированные на запросе рецепты пользователя."""
+    user_recipes = getattr(request, '_user_recipes', None)
+    if user_recipes is None:
+        user_recipes = UserRecipes(request.user)
+        request._user_recipes = user_recipes
+    return user_recipes
+
+
+def get_recipes_limit(request):
+    """Положительное значение параметра recipes_limit или None."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None or not recipes_limit.isdigit():
+        return None
+    return int(recipes_limit) or None
@@ -1,25 +1,68 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch, Subquery, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import mixins, status, viewsets
+from rest_framework import generics, mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
-from rest_framework.permissions import (SAFE_METHODS, IsAuthenticated,
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
-
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
-                            Subscribe, Tag)
+from rest_framework.views import APIView
+
+from foodgram.db.base import connection_stats
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingCart, Subscribe, Tag)
+from recipes.matching import match_recipes
+from recipes.search import search_ingredients
+from recipes.services import add_user_recipes, remove_user_recipes
 from users.models import User
-from .filters import IngredientFilter, RecipesFilter
+from .cache import (RecipeCacheMixin, ReferenceCacheMixin,
+                    anonymous_cache)
+from .exports import RENDERERS, shopping_list_response
+from .fast_serializers import RECIPE_FIELDS, FastRecipeSerializer
+from .filters import RecipesFilter
+from .metrics import metrics, query_budget
+from .pagination import (CustomPageNumberPagination, FeedPagination,
+                         RecipePagination, SubscribePagination)
 from .permissions import IsAuthorOrAdminOrReadOnly
 from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeSerializer,
+                          RecipeCreateSerializer, RecipeIdsSerializer,
+                          RecipeMatchSerializer, RecipeSerializer,
                           SetPasswordSerializer, ShoppingCartSerializer,
                           SubscribeSerializer, TagSerializer,
                           UserCreateSerializer, UserSerializer)
+from .utils import get_recipes_limit
+
+
+def change_user_recipes(request, model):
+    """
+    Добавляет (POST) или удаляет (DELETE) рецепты из списка recipes
+    в избранное или список покупок и возвращает результат по каждому.
+    """
+    serializer = RecipeIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+    if request.method == 'POST':
+        added, existing = add_user_recipes(
+            model, request.user.id, recipe_ids)
+        results = [
+            'added' if recipe_id in added
+            else 'exists' if recipe_id in existing
+            else 'not_found'
+            for recipe_id in recipe_ids
+        ]
+    else:
+        removed = remove_user_recipes(model, request.user.id, recipe_ids)
+        results = [
+            'removed' if recipe_id in removed else 'not_found'
+            for recipe_id in recipe_ids
+        ]
+    return Response({'results': [
+        {'id': recipe_id, 'status': result}
+        for recipe_id, result in zip(recipe_ids, results)
+    ]})
 
 
 class UserViewSet(UserViewSet):
@@ -27,6 +70,16 @@ class UserViewSet(UserViewSet):
     queryset = User.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(is_subscribed=Value(False))
+        return queryset.annotate(is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('pk'))))
+
     def get_serializer_class(self):
         if self.action == 'set_password':
             return SetPasswordSerializer
@@ -41,9 +94,22 @@ class UserViewSet(UserViewSet):
 
     @action(
         detail=False,
-        permission_classes=(IsAuthenticated,))
+        permission_classes=(IsAuthenticated,),
+        pagination_class=SubscribePagination)
+    @query_budget(3)
     def subscriptions(self, request):
-        queryset = Subscribe.objects.filter(user=request.user)
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]))
+        queryset = Subscribe.objects.filter(
+            user=request.user
+        ).select_related('author').prefetch_related(Prefetch(
+            'author__recipe', queryset=recipes, to_attr='recipes_preview'),
+        ).order_by('-created')
         pages = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
             pages,
@@ -52,66 +118,176 @@ class UserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, SearchFilter)
-    filterset_class = IngredientFilter
     pagination_class = None
+    reference_name = 'ingredients'
+
+    def filter_queryset(self, queryset):
+        name = self.request.query_params.get('name')
+        if self.action != 'list' or not name:
+            return queryset
+        return search_ingredients(name)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReferenceCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тегов"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    reference_name = 'tags'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(RecipeCacheMixin, viewsets.ModelViewSet):
     """Вьюсет рецептов"""
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrAdminOrReadOnly)
+    pagination_class = RecipePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipesFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve', 'feed', 'cook'):
+            return queryset
+        if not settings.API_FAST_SERIALIZERS:
+            queryset = queryset.select_related('author').prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe',
+                    queryset=IngredientAmount.objects.select_related(
+                        'ingredient')),
+            )
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(author_is_subscribed=Value(False))
+        return queryset.annotate(author_is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('author'))))
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    def fast_list(self, queryset):
+        """Список рецептов через FastRecipeSerializer."""
+        queryset = queryset.values(*RECIPE_FIELDS)
+        page = self.paginate_queryset(queryset)
+        serializer = FastRecipeSerializer(self.request)
+        if page is None:
+            return Response(serializer.serialize(queryset))
+        return self.get_paginated_response(serializer.serialize(page))
+
+    @anonymous_cache
+    @query_budget(6)
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        return self.fast_list(self.filter_queryset(self.get_queryset()))
+
+    @anonymous_cache
+    @query_budget(4)
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.API_FAST_SERIALIZERS:
+            return super().retrieve(request, *args, **kwargs)
+        # Как GenericAPIView.get_object: pk не число — тоже 404
+        recipe = generics.get_object_or_404(
+            self.filter_queryset(self.get_queryset()).values(*RECIPE_FIELDS),
+            pk=kwargs['pk'])
+        self.check_object_permissions(request, recipe)
+        return Response(FastRecipeSerializer(request).serialize((recipe,))[0])
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination)
+    @query_budget(6)
+    def feed(self, request):
+        # Рецепты ленты выбирает FeedPagination
+        queryset = self.filter_queryset(self.get_queryset())
+        if settings.API_FAST_SERIALIZERS:
+            return self.fast_list(queryset)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def serialize_matches(self, matches):
+        """Рецепты подбора со списком недостающих ингредиентов."""
+        queryset = self.get_queryset().filter(
+            id__in=[match.recipe_id for match in matches])
+        if settings.API_FAST_SERIALIZERS:
+            recipes = {
+                row['id']: row for row in queryset.values(*RECIPE_FIELDS)}
+        else:
+            recipes = queryset.in_bulk()
+        matches = [match for match in matches if match.recipe_id in recipes]
+        recipes = [recipes[match.recipe_id] for match in matches]
+        if settings.API_FAST_SERIALIZERS:
+            data = FastRecipeSerializer(self.request).serialize(recipes)
+        else:
+            data = self.get_serializer(recipes, many=True).data
+        for item, match in zip(data, matches):
+            item['missing_ingredients'] = sorted(match.missing)
+        return data
+
+    @action(detail=False, pagination_class=CustomPageNumberPagination)
+    def cook(self, request):
+        """
+        Рецепты, которые можно приготовить из ингредиентов ingredients,
+        докупив не больше missing.
+        """
+        serializer = RecipeMatchSerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            'missing': request.query_params.get('missing', 0),
+        })
+        serializer.is_valid(raise_exception=True)
+        matches = match_recipes(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data['missing'])
+        page = self.paginate_queryset(matches)
+        if page is None:
+            return Response(self.serialize_matches(matches))
+        return self.get_paginated_response(self.serialize_matches(page))
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,))
+    def favorite_many(self, request):
+        return change_user_recipes(request, FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,))
+    def shopping_cart_many(self, request):
+        return change_user_recipes(request, ShoppingCart)
+
     @action(
         detail=False,
         methods=('get',),
         url_path='download_shopping_cart',
+        permission_classes=(IsAuthenticated,),
         pagination_class=None)
     def download_file(self, request):
-        user = request.user
-        if not user.shopping_cart.exists():
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in RENDERERS:
+            return Response(
+                f'Неизвестный формат файла: {file_format}',
+                status=status.HTTP_400_BAD_REQUEST)
+        response = shopping_list_response(request.user, file_format)
+        if response is None:
             return Response(
                 'В корзине нет товаров', status=status.HTTP_400_BAD_REQUEST)
-
-        text = 'Список покупок:\n\n'
-        ingredient_name = 'recipe__recipe__ingredient__name'
-        ingredient_unit = 'recipe__recipe__ingredient__measurement_unit'
-        recipe_amount = 'recipe__recipe__amount'
-        amount_sum = 'recipe__recipe__amount__sum'
-        cart = user.shopping_cart.select_related('recipe').values(
-            ingredient_name, ingredient_unit).annotate(Sum(
-                recipe_amount)).order_by(ingredient_name)
-        for _ in cart:
-            text += (
-                f'{_[ingredient_name]} ({_[ingredient_unit]})'
-                f' — {_[amount_sum]}\n'
-            )
-        response = HttpResponse(text, content_type='text/plain')
-        filename = 'list_shopping.txt'
-        response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
 
@@ -178,16 +354,10 @@ class FavoriteRecipeViewSet(mixins.CreateModelMixin,
 
     @action(methods=('delete',), detail=True)
     def delete(self, request, recipe_id):
-        user = request.user
-        if not user.favorite.select_related(
-                'recipe').filter(
-                    recipe_id=recipe_id).exists():
+        if not remove_user_recipes(
+                FavoriteRecipe, request.user.id, (int(recipe_id),)):
             return Response({'errors': 'Рецепт не в избранном'},
                             status=status.HTTP_400_BAD_REQUEST)
-        get_object_or_404(
-            FavoriteRecipe,
-            user=request.user,
-            recipe_id=recipe_id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -216,14 +386,24 @@ class ShoppingCartViewSet(mixins.CreateModelMixin,
 
     @action(methods=('delete',), detail=True)
     def delete(self, request, recipe_id):
-        user = request.user
-        if not user.shopping_cart.select_related(
-                'recipe').filter(
-                    recipe_id=recipe_id).exists():
+        if not remove_user_recipes(
+                ShoppingCart, request.user.id, (int(recipe_id),)):
             return Response({'errors': 'Рецепта нет в корзине'},
                             status=status.HTTP_400_BAD_REQUEST)
-        get_object_or_404(
-            ShoppingCart,
-            user=request.user,
-            recipe=recipe_id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Гистограммы метрик запросов текущего процесса"""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(metrics.as_dict())
+
+
+class DatabaseMetricsView(APIView):
+    """Счётчики соединений и пулов баз данных текущего процесса"""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(connection_stats())
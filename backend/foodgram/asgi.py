@@ -1,7 +1,114 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import SyncToAsync, async_to_sync
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+
+# Функция send текущего запроса ASGI, см. ThreadPoolASGIHandler.__call__
+response_send = ContextVar('response_send')
+
+
+class ThreadPoolASGIHandler(ASGIHandler):
+    """
+    Обработчик ASGI, который выполняет синхронные middleware и вьюсеты
+    целиком в пуле из ASGI_THREADS потоков, по одному переключению
+    потока на запрос. Цикл событий только читает запросы и отдаёт
+    ответы, поэтому медленные клиенты не занимают потоки.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Число потоков ограничивает и число соединений с базой данных
+        self.executor = ThreadPoolExecutor(
+            settings.ASGI_THREADS, thread_name_prefix='asgi')
+        self.get_response_in_pool = SyncToAsync(
+            self.get_response_in_thread, thread_sensitive=False,
+            executor=self.executor)
+
+    def load_middleware(self, is_async=False):
+        # В асинхронном режиме Django вызывает каждый синхронный
+        # middleware через sync_to_async, по два переключения на каждый
+        super().load_middleware(is_async=False)
+
+    async def __call__(self, scope, receive, send):
+        response_send.set(send)
+        await super().__call__(scope, receive, send)
+
+    def get_response_in_thread(self, request):
+        # Соединения с базой данных у каждого потока свои, а сигналы
+        # request_started и request_finished отправляются в другом потоке
+        close_old_connections()
+        try:
+            response = self.get_response(request)
+            if response.streaming:
+                # Django 3.2 перебирает потоковый ответ в цикле событий,
+                # где обращаться к базе данных нельзя, а курсор ответа
+                # открыт на соединении этого потока
+                self.send_streaming_response(
+                    response, async_to_sync(response_send.get()))
+            return response
+        finally:
+            close_old_connections()
+
+    def send_streaming_response(self, response, send):
+        """
+        Отправляет потоковый ответ из потока пула частями не меньше
+        chunk_size байт. Следующая часть читается после отправки
+        предыдущей, поэтому ответ целиком в памяти не собирается.
+        """
+        try:
+            send(self.get_response_start(response))
+            parts, size = [], 0
+            for part in response:
+                parts.append(part)
+                size += len(part)
+                if size >= self.chunk_size:
+                    send({
+                        'type': 'http.response.body',
+                        'body': b''.join(parts),
+                        'more_body': True,
+                    })
+                    parts, size = [], 0
+            send({'type': 'http.response.body', 'body': b''.join(parts)})
+        finally:
+            response.sent_in_thread = True
+            response.close()
+
+    @staticmethod
+    def get_response_start(response):
+        """Сообщение http.response.start, как в ASGIHandler.send_response."""
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()))
+        return {
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        }
+
+    async def get_response_async(self, request):
+        return await self.get_response_in_pool(request)
+
+    async def send_response(self, response, send):
+        if getattr(response, 'sent_in_thread', False):
+            return
+        await super().send_response(response, send)
+
+
+django.setup(set_prefix=False)
+application = ThreadPoolASGIHandler()
@@ -0,0 +1,270 @@
+import threading
+import time
+from collections import Counter
+
+from django.utils.functional import cached_property
+
+_lock = threading.Lock()
+_pools = {}
+_stats = {}
+
+
+class ConnectionStats:
+    """Счётчики соединений одной базы данных в текущем процессе."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+    def as_dict(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class ConnectionPool:
+    """
+    Открытые соединения с базой данных, общие для потоков процесса.
+    Первым выдаётся последнее возвращённое соединение, соединения
+    старше max_age секунд при возврате закрываются. Если выданы все
+    max_size соединений, ожидает свободное не дольше timeout секунд.
+    """
+
+    def __init__(self, max_size, timeout, max_age, stats):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.stats = stats
+        self.idle = []
+        # Соединение: (время создания, атрибуты обёртки для него)
+        self.connections = {}
+        # Открытые и создаваемые соединения
+        self.size = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Свободное соединение и атрибуты обёртки для него или (None, None),
+        если место под новое соединение занято и его нужно создать
+        и передать в add.
+        """
+        with self.condition:
+            if not self.idle and self.size >= self.max_size:
+                self.stats.add('waits')
+                start = time.monotonic()
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self.stats.add('timeouts')
+                        raise TimeoutError(
+                            f'Нет свободного соединения за {self.timeout} с')
+                    self.condition.wait(remaining)
+                self.stats.add('wait_ms', (time.monotonic() - start) * 1000)
+            self.stats.add('checkouts')
+            if self.idle:
+                connection = self.idle.pop()
+                return connection, self.connections[connection][1]
+            self.size += 1
+            return None, None
+
+    def add(self, connection, state):
+        with self.condition:
+            self.connections[connection] = (time.monotonic(), state)
+
+    def release(self, connection=None, reusable=True):
+        """
+        Возвращает соединение в пул. False, если его нужно закрыть:
+        оно устарело или не reusable. Без connection освобождает место
+        соединения, которое не удалось создать.
+        """
+        with self.condition:
+            created, _ = self.connections.get(connection, (None, None))
+            if reusable and created is not None and (
+                    self.max_age is None
+                    or time.monotonic() - created < self.max_age):
+                self.idle.append(connection)
+                self.condition.notify()
+                return True
+            self.connections.pop(connection, None)
+            self.size -= 1
+            self.condition.notify()
+            return False
+
+    def as_dict(self):
+        with self.condition:
+            return {
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+            }
+
+
+def get_stats(alias):
+    with _lock:
+        return _stats.setdefault(alias, ConnectionStats())
+
+
+def get_pool(alias, settings_dict):
+    with _lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                settings_dict['POOL_SIZE'],
+                settings_dict.get('POOL_TIMEOUT', 10),
+                settings_dict.get('POOL_MAX_AGE'),
+                _stats.setdefault(alias, ConnectionStats()),
+            )
+        return pool
+
+
+def connection_stats():
+    """Счётчики соединений и состояние пулов по базам данных."""
+    with _lock:
+        stats, pools = dict(_stats), dict(_pools)
+    return {
+        alias: {
+            **alias_stats.as_dict(),
+            'pool': pools[alias].as_dict() if alias in pools else None,
+        }
+        for alias, alias_stats in sorted(stats.items())
+    }
+
+
+class ConnectionReuseMixin:
+    """
+    Дополняет DatabaseWrapper настройками базы данных:
+    CONN_HEALTH_CHECKS — проверять повторно используемое соединение
+    перед первым запросом к нему, как в Django 4.1;
+    POOL_SIZE, POOL_TIMEOUT, POOL_MAX_AGE — пул соединений процесса,
+    в который соединение возвращается в конце каждого запроса
+    с откатом незавершённой транзакции. С пулом CONN_MAX_AGE
+    не действует: время жизни соединения задаёт POOL_MAX_AGE.
+    """
+    # Атрибуты, которые get_new_connection задаёт обёртке для соединения
+    connection_state = ()
+    health_check_done = True
+
+    @cached_property
+    def pool(self):
+        if not self.settings_dict.get('POOL_SIZE'):
+            return None
+        # Соединение с базой в памяти закрывать нельзя, см. sqlite3
+        is_in_memory_db = getattr(self, 'is_in_memory_db', None)
+        if is_in_memory_db is not None and is_in_memory_db():
+            return None
+        return get_pool(self.alias, self.settings_dict)
+
+    def is_connection_usable(self, connection):
+        """is_usable для соединения, ещё не переданного обёртке."""
+        self.connection = connection
+        try:
+            return self.is_usable()
+        finally:
+            self.connection = None
+
+    def acquire_from_pool(self, pool):
+        """
+        Соединение из пула или None, если нужно создать новое.
+        При CONN_HEALTH_CHECKS соединение проверяется до connect,
+        который сразу настраивает его запросами к базе.
+        """
+        while True:
+            try:
+                connection, state = pool.acquire()
+            except TimeoutError as error:
+                raise self.Database.OperationalError(str(error)) from None
+            if connection is None:
+                return None
+            for name, value in state.items():
+                setattr(self, name, value)
+            if not self.settings_dict.get('CONN_HEALTH_CHECKS'):
+                return connection
+            stats = get_stats(self.alias)
+            stats.add('health_checks')
+            if self.is_connection_usable(connection):
+                return connection
+            stats.add('health_check_failures')
+            pool.release(connection, reusable=False)
+            try:
+                connection.close()
+            except self.Database.Error:
+                pass
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is not None:
+            connection = self.acquire_from_pool(pool)
+            if connection is not None:
+                self.health_check_done = True
+                return connection
+        stats = get_stats(self.alias)
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            stats.add('connect_errors')
+            if pool is not None:
+                pool.release()
+            raise
+        stats.add('connections_opened')
+        if pool is not None:
+            pool.add(connection, {
+                name: getattr(self, name) for name in self.connection_state})
+        self.health_check_done = True
+        return connection
+
+    def connect(self):
+        super().connect()
+        if self.pool is not None:
+            # Соединение возвращается в пул в конце каждого запроса
+            self.close_at = time.monotonic()
+
+    def close_if_health_check_failed(self):
+        if (self.health_check_done
+                or self.connection is None
+                or self.in_atomic_block):
+            return
+        self.health_check_done = True
+        if self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            stats = get_stats(self.alias)
+            stats.add('health_checks')
+            if not self.is_usable():
+                stats.add('health_check_failures')
+                # Чтобы соединение не вернулось в пул
+                self.errors_occurred = True
+                self.close()
+
+    def _cursor(self, name=None):
+        # Соединение из пула проверяется сразу после выдачи
+        self.ensure_connection()
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def is_reusable(self):
+        # Внутри atomic Django держит ссылку на закрытое соединение
+        # до выхода из блока, поэтому вернуть его в пул нельзя
+        if self.errors_occurred or self.in_atomic_block:
+            return False
+        try:
+            # Транзакцию могли начать без atomic, см. set_autocommit
+            self.connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return None
+        pool = self.pool
+        if pool is not None and pool.release(
+                self.connection, self.is_reusable()):
+            return None
+        get_stats(self.alias).add('connections_closed')
+        return super()._close()
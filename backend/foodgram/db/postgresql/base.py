@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from ..base import ConnectionReuseMixin
+
+
+class DatabaseWrapper(ConnectionReuseMixin, base.DatabaseWrapper):
+    connection_state = ('isolation_level',)
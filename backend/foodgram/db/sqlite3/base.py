@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from ..base import ConnectionReuseMixin
+
+
+class DatabaseWrapper(ConnectionReuseMixin, base.DatabaseWrapper):
+    pass
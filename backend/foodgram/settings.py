@@ -11,7 +11,7 @@ load_dotenv(os.path.join(BASE_DIR.parent, 'infra/.env'), verbose=True)
 
 SECRET_KEY = get_random_secret_key()
 
-DEBUG = os.getenv('DEBUG')
+DEBUG = os.getenv('DEBUG') == 'True'
 
 ALLOWED_HOSTS = [
     '127.0.0.1',
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,17 +68,50 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+# Стандартные бэкенды с проверкой соединений и пулом, см. foodgram/db
+DB_BACKENDS = {
+    'django.db.backends.postgresql': 'foodgram.db.postgresql',
+    'django.db.backends.sqlite3': 'foodgram.db.sqlite3',
+}
+
+DB_ENGINE = os.getenv('DB_ENGINE', default='django.db.backends.postgresql')
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': DB_BACKENDS.get(DB_ENGINE, DB_ENGINE),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Секунд жизни соединения, 0 — новое соединение на каждый запрос
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=0)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS') == 'True',
+        # Соединений в пуле процесса, 0 — без пула. С пулом соединение
+        # возвращается в пул в конце запроса, CONN_MAX_AGE не действует
+        'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', default=0)),
+        'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        'POOL_MAX_AGE': int(os.getenv('DB_POOL_MAX_AGE', default=600)),
+    }
+}
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', default=LOCMEM_CACHE)
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
     }
 }
 
+# Кеш в памяти у каждого воркера свой, и новая версия данных после
+# записи в одном воркере не видна остальным. Поэтому с ним ответы API
+# кешируются, только если воркер один, см. api/cache.py
+API_RESPONSE_CACHE = (
+    CACHE_BACKEND != LOCMEM_CACHE or os.getenv('WEB_CONCURRENCY') == '1')
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,6 +167,16 @@ REST_FRAMEWORK = {
     ],
 }
 
+API_METRICS = os.getenv('API_METRICS', default='True') == 'True'
+
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE') == 'True'
+
+API_FAST_SERIALIZERS = os.getenv(
+    'API_FAST_SERIALIZERS', default='True') == 'True'
+
+# Потоков для обработки запросов в воркере ASGI, см. foodgram/asgi.py
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', default=8))
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
@@ -0,0 +1,186 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase
+
+from foodgram.db import base
+from foodgram.db.sqlite3.base import DatabaseWrapper
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Выдача, возврат и ожидание соединений пула."""
+
+    def get_pool(self, max_size=2, timeout=1, max_age=None):
+        return base.ConnectionPool(
+            max_size, timeout, max_age, base.ConnectionStats())
+
+    def test_acquire_and_release(self):
+        pool = self.get_pool()
+        self.assertEqual(pool.acquire(), (None, None))
+        connection = object()
+        pool.add(connection, {'isolation_level': 1})
+        self.assertTrue(pool.release(connection))
+        self.assertEqual(
+            pool.acquire(), (connection, {'isolation_level': 1}))
+        self.assertEqual(pool.as_dict(), {
+            'max_size': 2, 'size': 1, 'idle': 0, 'in_use': 1})
+        self.assertEqual(pool.stats.as_dict(), {'checkouts': 2})
+
+    def test_release_not_reusable_or_obsolete(self):
+        pool = self.get_pool(max_age=0)
+        for reusable in (True, False):
+            with self.subTest(reusable=reusable):
+                pool.acquire()
+                connection = object()
+                pool.add(connection, {})
+                self.assertFalse(pool.release(connection, reusable))
+                self.assertEqual(pool.as_dict()['size'], 0)
+
+    def test_release_failed_connect(self):
+        pool = self.get_pool(max_size=1)
+        pool.acquire()
+        self.assertFalse(pool.release())
+        self.assertEqual(pool.acquire(), (None, None))
+
+    def test_timeout(self):
+        pool = self.get_pool(max_size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        self.assertEqual(pool.stats.counts['timeouts'], 1)
+
+    def test_wait_for_connection_from_other_thread(self):
+        pool = self.get_pool(max_size=1)
+        pool.acquire()
+        connection = object()
+        pool.add(connection, {})
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(pool.acquire)
+            while not pool.stats.counts['waits']:
+                threading.Event().wait(0.01)
+            pool.release(connection)
+            self.assertEqual(future.result(timeout=1), (connection, {}))
+
+
+class ConnectionReuseTests(SimpleTestCase):
+    """Соединения SQLite возвращаются в пул и проверяются при выдаче."""
+
+    def setUp(self):
+        fd, self.name = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, self.name)
+        self.alias = f'pool_{id(self)}'
+        self.addCleanup(base._pools.pop, self.alias, None)
+        self.addCleanup(base._stats.pop, self.alias, None)
+
+    def get_wrapper(self, **settings):
+        wrapper = self.create_wrapper(**settings)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def create_wrapper(self, **settings):
+        return DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'foodgram.db.sqlite3',
+            'NAME': self.name,
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'POOL_SIZE': 2,
+            'POOL_TIMEOUT': 0.05,
+            'POOL_MAX_AGE': None,
+            **settings,
+        }, self.alias)
+
+    def get_stats(self):
+        return base.get_stats(self.alias).as_dict()
+
+    def test_connection_returns_to_pool_at_request_end(self):
+        wrapper = self.get_wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        # С пулом CONN_MAX_AGE не действует
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(wrapper.pool.as_dict()['idle'], 1)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(wrapper.connection, raw)
+        self.assertEqual(self.get_stats(), {
+            'checkouts': 2, 'connections_opened': 1, 'health_checks': 1})
+
+    def test_open_transaction_is_rolled_back(self):
+        wrapper = self.get_wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id integer)')
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute('INSERT INTO item VALUES (1)')
+        wrapper.close()
+        self.assertEqual(wrapper.pool.as_dict()['idle'], 1)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM item')
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_connection_with_errors_is_discarded(self):
+        wrapper = self.get_wrapper()
+        wrapper.ensure_connection()
+        wrapper.errors_occurred = True
+        wrapper.close()
+        self.assertEqual(wrapper.pool.as_dict()['size'], 0)
+        self.assertEqual(self.get_stats()['connections_closed'], 1)
+
+    def assert_health_check_failed(self, wrapper, raw):
+        # Для SQLite is_usable всегда True, поэтому обрыв соединения
+        # имитируется закрытием и ответом is_usable
+        raw.close()
+        with mock.patch.object(wrapper, 'is_usable', return_value=False):
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        self.assertIsNot(wrapper.connection, raw)
+        stats = self.get_stats()
+        self.assertEqual(stats['health_check_failures'], 1)
+        self.assertEqual(stats['connections_opened'], 2)
+
+    def test_failed_health_check_in_pool(self):
+        wrapper = self.get_wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assert_health_check_failed(wrapper, raw)
+        self.assertEqual(wrapper.pool.as_dict()['size'], 1)
+
+    def test_failed_health_check_without_pool(self):
+        wrapper = self.get_wrapper(POOL_SIZE=0)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        # Конец запроса: соединение моложе CONN_MAX_AGE остаётся открытым
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIs(wrapper.connection, raw)
+        self.assert_health_check_failed(wrapper, raw)
+
+    def test_pool_timeout(self):
+        wrappers = [self.get_wrapper(POOL_SIZE=1) for _ in range(2)]
+        wrappers[0].ensure_connection()
+        with self.assertRaises(OperationalError):
+            wrappers[1].ensure_connection()
+        self.assertEqual(self.get_stats()['timeouts'], 1)
+
+    def test_connection_shared_between_threads(self):
+        # В режиме ASGI запросы выполняются в потоках пула, и у каждого
+        # потока своя обёртка соединения
+        def run_query():
+            wrapper = self.create_wrapper()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            raw = wrapper.connection
+            wrapper.close()
+            return raw
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            first = executor.submit(run_query).result()
+        self.assertIs(run_query(), first)
+        self.assertEqual(self.get_stats()['connections_opened'], 1)
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# wsgi — синхронные воркеры, asgi — воркеры uvicorn. Асинхронных
+# представлений нет: в asgi все представления выполняются в пуле
+# потоков ThreadPoolASGIHandler размером ASGI_THREADS
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    default_workers = multiprocessing.cpu_count()
+elif SERVER_MODE == 'wsgi':
+    wsgi_app = 'foodgram.wsgi:application'
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+else:
+    raise ValueError(f'Неизвестный SERVER_MODE: {SERVER_MODE}')
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', default=default_workers))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=30))
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
+from users.admin import CounterListFilter
 from .models import (FavoriteRecipe, Ingredient, IngredientAmount, Recipe,
                      ShoppingCart, Subscribe, Tag)
+from .services import get_recipe_amounts, update_recipe_in_shopping_carts
 
 
 class IngredientsInline(admin.TabularInline):
@@ -24,23 +26,42 @@ class IngredientAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class FavoritesCountFilter(CounterListFilter):
+    title = 'Добавлено в избранное'
+    parameter_name = 'favorites_count'
+
+
+class ShoppingCartCountFilter(CounterListFilter):
+    title = 'Добавлено в список покупок'
+    parameter_name = 'shopping_cart_count'
+
+
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
-        'count_favorite',
+        'favorites_count',
+        'shopping_cart_count',
     )
     exclude = ('tags',)
-    readonly_fields = ('count_favorite',)
+    readonly_fields = ('favorites_count', 'shopping_cart_count')
     inlines = (IngredientsInline, TagsInline,)
     search_fields = ('name', 'author', 'tags')
-    list_filter = ('name', 'author', 'tags')
+    list_filter = (
+        'name',
+        'author',
+        'tags',
+        FavoritesCountFilter,
+        ShoppingCartCountFilter,
+    )
     empty_value_display = '-пусто-'
 
-    def count_favorite(self, obj):
-        return obj.favorite.count()
-
-    count_favorite.short_description = 'Добавлено в избранное'
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = get_recipe_amounts(recipe.id) if change else {}
+        super().save_related(request, form, formsets, change)
+        update_recipe_in_shopping_carts(
+            recipe.id, old_amounts, get_recipe_amounts(recipe.id))
 
 
 admin.site.register(Recipe, RecipeAdmin)
@@ -4,3 +4,13 @@ ONE_MINUTES = 1
 THREE_HUNDRED_MINUTES = 300
 ONE_GRAMM_NGREDIENTS = 1
 THREE_THOUSANS_GRAMM_INGREDIENTS = 3000
+INGREDIENT_SEARCH_LIMIT = 50
+POPULAR_HALF_LIFE_DAYS = 30
+TRENDING_HALF_LIFE_DAYS = 3
+TIMELINE_LENGTH = 500
+FANOUT_FOLLOWERS_LIMIT = 1000
+BULK_RECIPES_LIMIT = 100
+SEARCH_CONFIG = 'russian'
+INGREDIENT_INDEX_REBUILD_INTERVAL = 30
+MATCH_INGREDIENTS_LIMIT = 100
+MATCH_MISSING_LIMIT = 5
@@ -0,0 +1,252 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TO = 'recipes/images'
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+RENDITION_WORKERS = 2
+
+# Название: наибольшая сторона в пикселях
+RENDITIONS = {
+    'thumbnail': 320,
+    'card': 640,
+    'full': 1280,
+}
+RENDITION_FORMAT, RENDITION_EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg'))
+RENDITION_QUALITY = 80
+# Сколько секунд помнить, что копий изображения ещё нет
+RENDITIONS_MISSING_TIMEOUT = 60
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=RENDITION_WORKERS, thread_name_prefix='renditions')
+pending = {}
+pending_lock = threading.Lock()
+# Изображения, копии которых точно есть в хранилище
+ready = set()
+
+
+class ImageError(ValueError):
+    pass
+
+
+def decode_base64(data, output):
+    """
+    Декодирует base64 по частям в файл output и прерывается,
+    как только размер превышает MAX_IMAGE_SIZE. Пробелы и переводы
+    строк в данных пропускаются.
+    """
+    data = ''.join(data.split())
+    if len(data) // 4 * 3 > MAX_IMAGE_SIZE + 2:
+        raise ImageError('Размер изображения превышает допустимый')
+    step = DECODE_CHUNK_SIZE // 3 * 4
+    for start in range(0, len(data), step):
+        try:
+            output.write(base64.b64decode(
+                data[start:start + step], validate=True))
+        except (binascii.Error, ValueError):
+            raise ImageError('Изображение повреждено')
+        if output.tell() > MAX_IMAGE_SIZE:
+            raise ImageError('Размер изображения превышает допустимый')
+
+
+def copy_upload(upload, output):
+    """Копирует загруженный файл по частям с проверкой размера."""
+    if upload.size is not None and upload.size > MAX_IMAGE_SIZE:
+        raise ImageError('Размер изображения превышает допустимый')
+    for chunk in upload.chunks(DECODE_CHUNK_SIZE):
+        output.write(chunk)
+        if output.tell() > MAX_IMAGE_SIZE:
+            raise ImageError('Размер изображения превышает допустимый')
+
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(DECODE_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_image(file):
+    """Проверяет изображение и возвращает расширение по его формату."""
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError,
+            Image.DecompressionBombError):
+        raise ImageError('Загрузите правильное изображение')
+    if image_format not in EXTENSIONS:
+        raise ImageError('Неподдерживаемый формат изображения')
+    return EXTENSIONS[image_format]
+
+
+def rendition_name(name, rendition):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{rendition}.{RENDITION_EXTENSION}'
+
+
+def rendition_names(name):
+    return {
+        rendition: rendition_name(name, rendition) for rendition in RENDITIONS
+    }
+
+
+def ready_key(name):
+    return f'renditions:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def renditions_ready(name, storage=default_storage):
+    """
+    Есть ли в хранилище все уменьшенные копии изображения. Отметку
+    ставит create_renditions в общем кеше, поэтому её видят все
+    процессы. Без отметки наличие копий проверяется в хранилище,
+    а отсутствие запоминается на RENDITIONS_MISSING_TIMEOUT секунд.
+    """
+    if name in ready:
+        return True
+    if name in pending:
+        return False
+    key = ready_key(name)
+    exists = cache.get(key)
+    if exists is None:
+        exists = all(
+            storage.exists(path) for path in rendition_names(name).values())
+        cache.set(key, exists,
+                  None if exists else RENDITIONS_MISSING_TIMEOUT)
+    if exists:
+        ready.add(name)
+    return exists
+
+
+def make_rendition(content, size):
+    """Уменьшенная копия изображения в формате RENDITION_FORMAT."""
+    with Image.open(BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if RENDITION_FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGB' if RENDITION_FORMAT == 'JPEG' else 'RGBA')
+        output = BytesIO()
+        image.save(output, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+    return output.getvalue()
+
+
+def create_renditions(name, storage=default_storage):
+    """Создаёт недостающие уменьшенные копии изображения name."""
+    missing = {
+        rendition: path for rendition, path in rendition_names(name).items()
+        if not storage.exists(path)
+    }
+    if missing:
+        with storage.open(name) as file:
+            content = file.read()
+        for rendition, path in missing.items():
+            saved = storage.save(path, ContentFile(
+                make_rendition(content, RENDITIONS[rendition])))
+            if saved != path:
+                # Копию уже создал другой процесс
+                storage.delete(saved)
+    cache.set(ready_key(name), True, None)
+
+
+def rendition_done(name, future):
+    with pending_lock:
+        pending.pop(name, None)
+    error = future.exception()
+    if error is not None:
+        logger.error('Ошибка создания копий изображения', exc_info=error)
+
+
+def schedule_renditions(name):
+    """Создаёт уменьшенные копии в пуле потоков, не задерживая запрос."""
+    with pending_lock:
+        future = pending.get(name)
+        if future is None:
+            future = pending[name] = executor.submit(create_renditions, name)
+            future.add_done_callback(partial(rendition_done, name))
+    return future
+
+
+class ImageUpload:
+    """
+    Проверенное изображение во временном файле. Файл попадает
+    в хранилище только при вызове save, после проверки всего запроса.
+    """
+
+    def __init__(self, file, name):
+        self.file = file
+        self.name = name
+
+    def save(self, storage=default_storage):
+        """
+        Сохраняет изображение под именем по хешу содержимого
+        и возвращает имя файла. Одинаковые изображения хранятся
+        в одном экземпляре.
+        """
+        with self.file:
+            if not storage.exists(self.name):
+                self.file.seek(0)
+                self.name = storage.save(
+                    self.name, File(self.file, name=self.name))
+        schedule_renditions(self.name)
+        return self.name
+
+
+def read_image(data):
+    """
+    Читает изображение из строки base64 или загруженного файла
+    во временный файл и проверяет его, ничего не сохраняя.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        if isinstance(data, str):
+            decode_base64(data, file)
+        else:
+            copy_upload(data, file)
+        extension = verify_image(file)
+    except ImageError:
+        file.close()
+        raise
+    return ImageUpload(file, f'{UPLOAD_TO}/{hash_file(file)}.{extension}')
+
+
+def rendition_urls(name, storage=default_storage):
+    """
+    Адреса уменьшенных копий изображения строятся по его имени.
+    Пока копии не созданы, вместо них отдаётся оригинал.
+    """
+    if not name:
+        return None
+    if not renditions_ready(name, storage):
+        return dict.fromkeys(RENDITIONS, storage.url(name))
+    return {
+        rendition: storage.url(path)
+        for rendition, path in rendition_names(name).items()
+    }
@@ -0,0 +1,183 @@
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .models import Ingredient, Tag
+
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+TAG_FIELDS = ('name', 'color', 'slug')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def clean_rows(rows, fields, key):
+    """
+    Строки только с полями fields, без пробелов по краям и без
+    повторов значений полей key.
+    """
+    seen = set()
+    for row in rows:
+        row = {field: str(row[field]).strip() for field in fields}
+        value = tuple(row[field] for field in key)
+        if all(value) and value not in seen:
+            seen.add(value)
+            yield row
+
+
+def load_ingredients(rows, update=False, batch_size=1000):
+    """
+    Добавляет недостающие ингредиенты частями по batch_size.
+    При update меняет единицу измерения у ингредиента с тем же названием,
+    если он в базе один. Возвращает число добавленных, изменённых
+    и пропущенных строк.
+    """
+    result = Counter(inserted=0, updated=0, skipped=0)
+    rows = clean_rows(
+        rows, INGREDIENT_FIELDS,
+        key=('name',) if update else INGREDIENT_FIELDS)
+    for chunk in chunked(rows, batch_size):
+        existing = defaultdict(list)
+        for ingredient in Ingredient.objects.filter(
+                name__in={row['name'] for row in chunk}):
+            existing[ingredient.name].append(ingredient)
+        new, changed = [], []
+        for row in chunk:
+            same_name = existing[row['name']]
+            if any(ingredient.measurement_unit == row['measurement_unit']
+                   for ingredient in same_name):
+                result['skipped'] += 1
+            elif update and len(same_name) == 1:
+                same_name[0].measurement_unit = row['measurement_unit']
+                changed.append(same_name[0])
+            else:
+                new.append(Ingredient(**row))
+        with transaction.atomic():
+            Ingredient.objects.bulk_update(changed, ('measurement_unit',))
+            Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        result['updated'] += len(changed)
+        result['inserted'] += len(new)
+    return result
+
+
+def load_tags(rows, update=False, batch_size=1000):
+    """
+    Добавляет недостающие теги, сопоставляя их по slug. При update
+    меняет название и цвет существующих тегов.
+    """
+    result = Counter(inserted=0, updated=0, skipped=0)
+    for chunk in chunked(clean_rows(rows, TAG_FIELDS, key=('slug',)),
+                         batch_size):
+        existing = Tag.objects.in_bulk(
+            [row['slug'] for row in chunk], field_name='slug')
+        new, changed = [], []
+        for row in chunk:
+            tag = existing.get(row['slug'])
+            if tag is None:
+                new.append(Tag(**row))
+            elif update and (tag.name, tag.color) != (
+                    row['name'], row['color']):
+                tag.name, tag.color = row['name'], row['color']
+                changed.append(tag)
+            else:
+                result['skipped'] += 1
+        with transaction.atomic():
+            Tag.objects.bulk_update(changed, ('name', 'color'))
+            before = Tag.objects.count()
+            Tag.objects.bulk_create(new, ignore_conflicts=True)
+            inserted = Tag.objects.count() - before
+        result['updated'] += len(changed)
+        result['inserted'] += inserted
+        # Теги, совпавшие с существующими по названию или цвету
+        result['skipped'] += len(new) - inserted
+    return result
+
+
+def load_fixture_objects(model, objects, update=False, batch_size=1000):
+    """
+    Загружает объекты модели из дампа с сохранением первичных ключей.
+    Существующие объекты пропускаются или при update перезаписываются.
+    """
+    result = Counter(inserted=0, updated=0, skipped=0)
+    fields = [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    auto_fields = [
+        field.name for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    for chunk in chunked(objects, batch_size):
+        existing = set(model.objects.filter(
+            pk__in=[item.object.pk for item in chunk]
+        ).values_list('pk', flat=True))
+        new = [item for item in chunk if item.object.pk not in existing]
+        changed = [item for item in chunk if item.object.pk in existing]
+        dates = [
+            [getattr(item.object, name) for name in auto_fields]
+            for item in new
+        ]
+        before = model.objects.count()
+        model.objects.bulk_create(
+            [item.object for item in new], ignore_conflicts=True)
+        inserted = model.objects.count() - before
+        result['inserted'] += inserted
+        # Объекты, совпавшие с существующими по уникальным полям
+        result['skipped'] += len(new) - inserted
+        if auto_fields:
+            # bulk_create заменяет значения auto_now_add текущим временем
+            for item, values in zip(new, dates):
+                for name, value in zip(auto_fields, values):
+                    setattr(item.object, name, value)
+            model.objects.bulk_update(
+                [item.object for item in new], auto_fields)
+        if inserted != len(new):
+            present = set(model.objects.filter(
+                pk__in=[item.object.pk for item in new]
+            ).values_list('pk', flat=True))
+            new = [item for item in new if item.object.pk in present]
+        if update:
+            model.objects.bulk_update(
+                [item.object for item in changed], fields)
+            result['updated'] += len(changed)
+        else:
+            result['skipped'] += len(changed)
+            changed = []
+        for item in new + changed:
+            for name, values in (item.m2m_data or {}).items():
+                getattr(item.object, name).set(values)
+    return result
+
+
+def load_fixture(objects, models, update=False, batch_size=1000):
+    """
+    Загружает из дампа dumpdata объекты моделей models в их порядке.
+    Остальные модели дампа пропускаются.
+    """
+    grouped = defaultdict(list)
+    for item in objects:
+        grouped[item.object._meta.label_lower].append(item)
+    results = {}
+    with transaction.atomic():
+        for label in models:
+            if label not in grouped:
+                continue
+            model = grouped[label][0].object.__class__
+            results[label] = load_fixture_objects(
+                model, grouped[label], update, batch_size)
+        loaded = [
+            grouped[label][0].object.__class__ for label in results]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), loaded):
+                cursor.execute(sql)
+    return results
@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.matching import IngredientIndex, match_recipes_sql
+from recipes.models import IngredientAmount
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение подбора рецептов по ингредиентам через индекс '
+        'и через GROUP BY/HAVING: совпадение результатов и время')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=50,
+            help='Наборов ингредиентов на каждый вариант')
+        parser.add_argument(
+            '--pantry', type=int, action='append',
+            help='Размер набора ингредиентов, по умолчанию 5, 10 и 20')
+        parser.add_argument(
+            '--missing', type=int, action='append',
+            help='Допустимо недостающих, по умолчанию 0, 1 и 2')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        start = time.perf_counter()
+        index = IngredientIndex(IngredientAmount.objects.values_list(
+            'recipe_id', 'ingredient_id').order_by().iterator())
+        self.stdout.write(
+            f'Индекс: {len(index.recipes)} рецептов, '
+            f'{len(index.postings)} ингредиентов, построен за '
+            f'{(time.perf_counter() - start) * 1000:.0f} мс')
+        if not index.recipes:
+            raise CommandError('Нет рецептов, запустите generate_dataset')
+        mismatches = 0
+        for size in options['pantry'] or (5, 10, 20):
+            pantries = [
+                self.get_pantry(index, size)
+                for _ in range(options['queries'])
+            ]
+            for missing in options['missing'] or (0, 1, 2):
+                mismatches += self.compare(index, pantries, size, missing)
+        if mismatches:
+            raise CommandError(f'{mismatches} - результатов различаются')
+        return 'Результаты индекса и SQL совпадают'
+
+    def get_pantry(self, index, size):
+        """
+        Ингредиенты случайного рецепта без нескольких из них
+        и случайные другие ингредиенты.
+        """
+        recipe = sorted(
+            index.recipes[self.random.choice(list(index.recipes))])
+        pantry = set(self.random.sample(recipe, max(
+            len(recipe) - self.random.randint(0, 2), 1)))
+        ingredient_ids = list(index.postings)
+        while len(pantry) < size:
+            pantry.add(self.random.choice(ingredient_ids))
+        return pantry
+
+    @staticmethod
+    def measure(function, pantries, missing):
+        durations, results = [], []
+        for pantry in pantries:
+            start = time.perf_counter()
+            results.append(function(pantry, missing))
+            durations.append((time.perf_counter() - start) * 1000)
+        return statistics.median(durations), max(durations), results
+
+    def compare(self, index, pantries, size, missing):
+        index_median, index_max, index_results = self.measure(
+            index.match, pantries, missing)
+        sql_median, sql_max, sql_results = self.measure(
+            match_recipes_sql, pantries, missing)
+        mismatches = sum(
+            index_result != sql_result
+            for index_result, sql_result in zip(index_results, sql_results))
+        found = statistics.mean(len(result) for result in index_results)
+        self.stdout.write(
+            f'Набор {size}, недостающих {missing}: в среднем {found:.1f} '
+            f'рецептов; индекс {index_median:.2f} мс (макс. '
+            f'{index_max:.2f}), SQL {sql_median:.2f} мс (макс. '
+            f'{sql_max:.2f}); различий {mismatches}')
+        return mismatches
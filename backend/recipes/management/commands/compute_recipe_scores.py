@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.services import compute_recipe_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт рейтингов рецептов для сортировки по популярности'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Пересчитывать каждые N секунд, не завершая работу',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = compute_recipe_scores()
+            self.stdout.write(f'{count} - рейтингов рецептов пересчитано')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
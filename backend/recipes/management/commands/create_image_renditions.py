@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import create_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий картинок существующих рецептов'
+
+    def handle(self, *args, **options):
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True).distinct().order_by()
+        count = 0
+        for name in names.iterator():
+            try:
+                create_renditions(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            count += 1
+        return f'{count} - картинок обработано'
@@ -0,0 +1,190 @@
+import csv
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from api.cache import invalidate
+from recipes.images import read_image, schedule_renditions
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingCart, Subscribe, Tag)
+from recipes.matching import reset_index
+from recipes.search import update_search_documents
+from recipes.services import (bulk_create_in_batches, compute_recipe_scores,
+                              rebuild_shopping_cart_totals, rebuild_timelines,
+                              reconcile_counters)
+from users.models import User
+
+INGREDIENTS_FILE = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+PASSWORD = 'benchmark-password'
+IMAGE_SIZE = (1280, 960)
+IMAGE_COLOR = (224, 108, 45)
+PUB_DATE_DAYS = 365
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетических данных для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--ingredients', type=int, default=8,
+            help='Ингредиентов в рецепте')
+        parser.add_argument('--tags', type=int, default=6)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Рецептов в избранном у пользователя')
+        parser.add_argument(
+            '--shopping-cart', type=int, default=5,
+            help='Рецептов в списке покупок у пользователя')
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Подписок у пользователя')
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Префикс имён пользователей и slug тегов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--ingredients-file', default=INGREDIENTS_FILE,
+            help='CSV с ингредиентами, если таблица ингредиентов пуста')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                f'укажите другой --prefix')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.image = self.create_image()
+        with transaction.atomic():
+            ingredient_ids = self.load_ingredients(options['ingredients_file'])
+            tag_ids = self.create_tags(prefix, options['tags'])
+            user_ids = self.create_users(prefix, options['users'])
+            recipe_ids = self.create_recipes(
+                prefix, options['recipes'], user_ids)
+            self.create_recipe_relations(
+                recipe_ids, tag_ids, ingredient_ids, options['ingredients'])
+            self.create_user_relations(user_ids, recipe_ids, options)
+        self.stdout.write(
+            'Пересчёт счётчиков, списков покупок, лент и поиска...')
+        reconcile_counters()
+        rebuild_shopping_cart_totals(self.batch_size)
+        compute_recipe_scores(batch_size=self.batch_size)
+        rebuild_timelines(self.batch_size)
+        update_search_documents()
+        reset_index()
+        for name in ('recipes', 'tags', 'ingredients', 'users'):
+            invalidate(name)
+        return (f'{len(user_ids)} - пользователей, '
+                f'{len(recipe_ids)} - рецептов создано')
+
+    def bulk_create(self, model, objs, **kwargs):
+        count = bulk_create_in_batches(model, objs, self.batch_size, **kwargs)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {count}')
+
+    def create_image(self):
+        """
+        Сохраняет изображение для рецептов так же, как при загрузке
+        через API, и дожидается его уменьшенных копий.
+        """
+        content = BytesIO()
+        Image.new('RGB', IMAGE_SIZE, IMAGE_COLOR).save(content, 'JPEG')
+        name = read_image(ContentFile(content.getvalue())).save()
+        schedule_renditions(name).result()
+        return name
+
+    def load_ingredients(self, path):
+        if not Ingredient.objects.exists():
+            with open(path, encoding='utf-8') as csv_file:
+                self.bulk_create(Ingredient, (
+                    Ingredient(**row) for row in csv.DictReader(csv_file)
+                ), ignore_conflicts=True)
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_tags(self, prefix, count):
+        self.bulk_create(Tag, (
+            Tag(name=f'{prefix} {number}', slug=f'{prefix}-{number}',
+                color=f'#{self.random.randrange(0x1000000):06x}')
+            for number in range(count)
+        ), ignore_conflicts=True)
+        return list(Tag.objects.filter(
+            slug__startswith=f'{prefix}-').values_list('id', flat=True))
+
+    def create_users(self, prefix, count):
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(username=f'{prefix}_{number}',
+                 email=f'{prefix}_{number}@example.com',
+                 first_name='Имя', last_name='Фамилия', password=password)
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}_').values_list('id', flat=True))
+
+    def create_recipes(self, prefix, count, user_ids):
+        self.bulk_create(Recipe, (
+            Recipe(author_id=self.random.choice(user_ids),
+                   name=f'Рецепт {prefix} {number}',
+                   text='Описание рецепта ' * 10,
+                   cooking_time=self.random.randint(1, 300),
+                   image=self.image)
+            for number in range(count)
+        ))
+        recipes = list(Recipe.objects.filter(
+            author__username__startswith=f'{prefix}_'))
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=self.random.randrange(PUB_DATE_DAYS * 24 * 60 * 60))
+        Recipe.objects.bulk_update(
+            recipes, ('pub_date',), batch_size=self.batch_size)
+        return [recipe.id for recipe in recipes]
+
+    def create_recipe_relations(self, recipe_ids, tag_ids, ingredient_ids,
+                                ingredients):
+        ingredients = min(ingredients, len(ingredient_ids))
+        tags = min(3, len(tag_ids))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.random.sample(
+                tag_ids, self.random.randint(min(1, tags), tags))
+        ))
+        self.bulk_create(IngredientAmount, (
+            IngredientAmount(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=self.random.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in self.random.sample(
+                ingredient_ids, ingredients)
+        ))
+
+    def create_user_relations(self, user_ids, recipe_ids, options):
+        for model, option in ((FavoriteRecipe, 'favorites'),
+                              (ShoppingCart, 'shopping_cart')):
+            count = min(options[option], len(recipe_ids))
+            self.bulk_create(model, (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in self.random.sample(recipe_ids, count)
+            ))
+        count = options['subscriptions']
+        self.bulk_create(Subscribe, (
+            Subscribe(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in self.get_authors(user_id, user_ids, count)
+        ))
+
+    def get_authors(self, user_id, user_ids, count):
+        authors = self.random.sample(
+            user_ids, min(count + 1, len(user_ids)))
+        return [author for author in authors if author != user_id][:count]
@@ -1,26 +1,106 @@
 import csv
+import json
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
+from django.conf import settings
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
 
-from recipes.models import Ingredient
+from api.cache import invalidate
+from recipes.loaders import load_fixture, load_ingredients, load_tags
+from recipes.matching import reset_index
+from recipes.search import reset_trie, update_search_documents
+from recipes.services import (compute_recipe_scores,
+                              rebuild_shopping_cart_totals, rebuild_timelines,
+                              reconcile_counters)
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+LOADERS = {
+    'ingredients': load_ingredients,
+    'tags': load_tags,
+}
+# Модели дампа dumpdata в порядке загрузки
+FIXTURE_MODELS = (
+    'users.user',
+    'recipes.tag',
+    'recipes.ingredient',
+    'recipes.recipe',
+    'recipes.ingredientamount',
+    'recipes.favoriterecipe',
+    'recipes.shoppingcart',
+    'recipes.subscribe',
+)
 
 
 class Command(BaseCommand):
-    help = 'Загрузка данных из csv файлов'
+    help = (
+        'Загрузка ингредиентов или тегов из csv и json файлов, '
+        'а также дампов dumpdata. Повторный запуск ничего не дублирует')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_PATH,
+            help='Путь к файлу .csv или .json')
+        parser.add_argument(
+            '--model', choices=LOADERS, default='ingredients',
+            help='Что содержит файл, если это не дамп dumpdata')
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновлять существующие записи: единицы измерения '
+                 'ингредиентов, названия и цвета тегов, объекты дампа')
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
-        with open(
-            'E:/Dev/foodgram-project-react/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as csv_file:
-            reader = csv.DictReader(csv_file)
-            try:
-                Ingredient.objects.bulk_create(
-                    Ingredient(**items) for items in reader
-                )
-            except IntegrityError:
-                return 'Такие ингредиенты уже есть...'
-        return (
-            f'{Ingredient.objects.count()} - ингредиентов успешно загружено')
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден')
+        if path.suffix not in ('.csv', '.json'):
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        with open(path, encoding='utf-8') as file:
+            if path.suffix == '.csv':
+                results = self.load_rows(csv.DictReader(file), options)
+            else:
+                results = self.load_json(json.load(file), options)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: добавлено - {result["inserted"]}, '
+                f'обновлено - {result["updated"]}, '
+                f'пропущено - {result["skipped"]}')
+        return 'Загрузка завершена'
+
+    def load_rows(self, rows, options):
+        model = options['model']
+        try:
+            result = LOADERS[model](
+                rows, options['update'], options['batch_size'])
+        except KeyError as error:
+            raise CommandError(f'В файле нет поля {error}')
+        self.reset_references()
+        return {model: result}
+
+    def load_json(self, data, options):
+        if not isinstance(data, list):
+            raise CommandError('Файл json должен содержать список')
+        if not data or 'model' not in data[0]:
+            return self.load_rows(data, options)
+        results = load_fixture(
+            serializers.deserialize('python', (
+                item for item in data if item['model'] in FIXTURE_MODELS
+            ), ignorenonexistent=True),
+            FIXTURE_MODELS, options['update'], options['batch_size'])
+        self.reset_references()
+        for name in ('recipes', 'users'):
+            invalidate(name)
+        reconcile_counters()
+        rebuild_shopping_cart_totals()
+        compute_recipe_scores()
+        rebuild_timelines()
+        update_search_documents()
+        reset_index()
+        return results
+
+    def reset_references(self):
+        """Массовая загрузка не вызывает сигналы моделей."""
+        reset_trie()
+        for reference in LOADERS:
+            invalidate(reference)
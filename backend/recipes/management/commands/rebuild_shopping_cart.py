@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingCartIngredient
+from recipes.services import (calculate_shopping_cart_totals,
+                              rebuild_shopping_cart_totals)
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт и проверка сумм ингредиентов списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить суммы, не изменяя их',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rebuild_shopping_cart_totals()
+            return (f'{ShoppingCartIngredient.objects.count()} - '
+                    f'сумм ингредиентов пересчитано')
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in calculate_shopping_cart_totals().iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()
+        }
+        mismatches = [
+            (key, expected.get(key), actual.get(key))
+            for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        ]
+        for (user_id, ingredient_id), total, amount in sorted(
+                mismatches, key=lambda item: item[0]):
+            self.stderr.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидалось {total}, сохранено {amount}')
+        if mismatches:
+            raise CommandError(
+                f'{len(mismatches)} - расхождений, запустите команду '
+                f'без --check для пересчёта')
+        return 'Суммы ингредиентов списков покупок согласованы'
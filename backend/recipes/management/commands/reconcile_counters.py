@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.services import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверка и пересчёт счётчиков избранного, подписок и рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, не изменяя их',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_counters(check=options['check'])
+        for counter, mismatched in mismatches.items():
+            self.stdout.write(f'{counter} - {mismatched} расхождений')
+        total = sum(mismatches.values())
+        if options['check'] and total:
+            raise CommandError(
+                f'{total} - расхождений, запустите команду '
+                f'без --check для пересчёта')
+        return 'Счётчики согласованы'
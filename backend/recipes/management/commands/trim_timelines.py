@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.services import trim_timelines
+
+
+class Command(BaseCommand):
+    help = 'Обрезка лент подписок до TIMELINE_LENGTH новых рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Обрезать каждые N секунд, не завершая работу',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = trim_timelines()
+            self.stdout.write(f'{count} - записей удалено из лент')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
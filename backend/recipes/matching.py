@@ -0,0 +1,170 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, namedtuple
+
+from django.db.models import Count, F, Q
+
+from api.cache import get_versions, invalidate
+from .constants import INGREDIENT_INDEX_REBUILD_INTERVAL
+from .models import IngredientAmount
+from .services import on_commit_for_recipes
+
+INDEX_NAME = 'ingredient_index'
+
+Match = namedtuple('Match', ('recipe_id', 'matched', 'missing'))
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс ингредиентов в памяти процесса: для каждого
+    ингредиента отсортированный массив id рецептов, в которых он есть.
+    """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.recipes = {}
+        postings = {}
+        for recipe_id, ingredient_id in rows:
+            self.recipes.setdefault(recipe_id, []).append(ingredient_id)
+            postings.setdefault(ingredient_id, []).append(recipe_id)
+        self.recipes = {
+            recipe_id: frozenset(ingredient_ids)
+            for recipe_id, ingredient_ids in self.recipes.items()
+        }
+        self.postings = {
+            ingredient_id: array('I', sorted(recipe_ids))
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self.lock = threading.Lock()
+
+    def set_recipe(self, recipe_id, ingredient_ids):
+        """Заменяет ингредиенты рецепта, пустой набор удаляет рецепт."""
+        ingredient_ids = frozenset(ingredient_ids)
+        with self.lock:
+            old = self.recipes.pop(recipe_id, frozenset())
+            for ingredient_id in old - ingredient_ids:
+                posting = self.postings[ingredient_id]
+                del posting[bisect_left(posting, recipe_id)]
+            for ingredient_id in ingredient_ids - old:
+                insort(self.postings.setdefault(
+                    ingredient_id, array('I')), recipe_id)
+            if ingredient_ids:
+                self.recipes[recipe_id] = ingredient_ids
+
+    def match(self, ingredient_ids, max_missing=0):
+        """
+        Рецепты, в которых есть хотя бы один из ingredient_ids и не
+        хватает не больше max_missing ингредиентов: сначала с меньшим
+        числом недостающих, затем с большим числом совпавших, затем
+        новые.
+        """
+        ingredient_ids = set(ingredient_ids)
+        matched = Counter()
+        with self.lock:
+            for ingredient_id in ingredient_ids:
+                matched.update(self.postings.get(ingredient_id, ()))
+            matches = [
+                Match(recipe_id, count,
+                      self.recipes[recipe_id] - ingredient_ids)
+                for recipe_id, count in matched.items()
+                if len(self.recipes[recipe_id]) - count <= max_missing
+            ]
+        matches.sort(key=lambda match: (
+            len(match.missing), -match.matched, -match.recipe_id))
+        return matches
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Индекс текущего процесса. Если индекс изменили в другом процессе,
+    он пересобирается не чаще INGREDIENT_INDEX_REBUILD_INTERVAL секунд.
+    """
+    global _index
+    version, = get_versions((INDEX_NAME,))
+    index = _index
+    if index is not None and (
+            index.version == version
+            or time.monotonic() - index.built_at
+            < INGREDIENT_INDEX_REBUILD_INTERVAL):
+        return index
+    with _index_lock:
+        if _index is index:
+            _index = IngredientIndex(
+                IngredientAmount.objects.values_list(
+                    'recipe_id', 'ingredient_id').order_by().iterator(),
+                version)
+        return _index
+
+
+def reset_index():
+    """Пересобрать индекс во всех процессах после массовых изменений."""
+    global _index
+    _index = None
+    invalidate(INDEX_NAME)
+
+
+def update_index(recipe_ids):
+    """Переносит в индекс текущие ингредиенты рецептов recipe_ids."""
+    recipe_ids = set(recipe_ids)
+    index = _index
+    if index is not None and recipe_ids:
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientAmount.objects.filter(
+                recipe_id__in=recipe_ids).values_list(
+                'recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id, ingredient_ids in ingredients.items():
+            index.set_recipe(recipe_id, ingredient_ids)
+    version = invalidate(INDEX_NAME)
+    # Если с версии индекса данные меняли только здесь, индекс
+    # актуален и пересобирать его не нужно
+    if index is not None and index.version is not None and (
+            version == index.version + 1):
+        index.version = version
+
+
+def refresh_index(recipe_ids):
+    """Обновляет индекс после фиксации транзакции."""
+    on_commit_for_recipes(update_index, recipe_ids)
+
+
+def match_recipes(ingredient_ids, max_missing=0):
+    """Подбор рецептов по имеющимся ингредиентам, см. IngredientIndex."""
+    return get_index().match(ingredient_ids, max_missing)
+
+
+def match_recipes_sql(ingredient_ids, max_missing=0):
+    """
+    Тот же подбор через GROUP BY/HAVING по IngredientAmount, без
+    индекса. Используется для сравнения в benchmark_matching.
+    """
+    ingredient_ids = set(ingredient_ids)
+    rows = IngredientAmount.objects.values('recipe_id').annotate(
+        total=Count('ingredient_id'),
+        matched=Count('ingredient_id', filter=Q(
+            ingredient_id__in=ingredient_ids)),
+    ).filter(
+        matched__gte=1,
+        total__lte=F('matched') + max_missing,
+    ).annotate(
+        missing_count=F('total') - F('matched'),
+    ).order_by('missing_count', '-matched', '-recipe_id').values_list(
+        'recipe_id', 'matched')
+    rows = list(rows)
+    missing = {}
+    for recipe_id, ingredient_id in IngredientAmount.objects.filter(
+            recipe_id__in=[recipe_id for recipe_id, _ in rows]).exclude(
+            ingredient_id__in=ingredient_ids).values_list(
+            'recipe_id', 'ingredient_id'):
+        missing.setdefault(recipe_id, set()).add(ingredient_id)
+    return [
+        Match(recipe_id, matched, frozenset(missing.get(recipe_id, ())))
+        for recipe_id, matched in rows
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:53
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Удаляет повторные записи (user, recipe) в избранном и списке покупок,
+    оставляя первую: после 0003 ограничения в базе не было. Суммы
+    ингредиентов списка покупок этих пользователей пересчитываются.
+    """
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient')
+    for model_name in ('FavoriteRecipe', 'ShoppingCart'):
+        model = apps.get_model('recipes', model_name)
+        duplicates = model.objects.values('user_id', 'recipe_id').annotate(
+            first_id=Min('id'), count=Count('id'),
+        ).filter(count__gt=1).order_by()
+        user_ids = set()
+        for row in duplicates:
+            model.objects.filter(
+                user_id=row['user_id'], recipe_id=row['recipe_id'],
+            ).exclude(id=row['first_id']).delete()
+            user_ids.add(row['user_id'])
+        if model_name != 'ShoppingCart' or not user_ids:
+            continue
+        ShoppingCartIngredient.objects.filter(user_id__in=user_ids).delete()
+        totals = IngredientAmount.objects.filter(
+            recipe__shopping_cart__user_id__in=user_ids,
+        ).values(
+            'ingredient_id',
+            user_id=F('recipe__shopping_cart__user'),
+        ).annotate(
+            total=Sum('amount'),
+        ).values_list('user_id', 'ingredient_id', 'total').order_by()
+        ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total)
+            for user_id, ingredient_id, total in totals
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoriterecipe',
+            index=models.Index(fields=['recipe', 'user'], name='favoriterecipe_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'user'], name='shoppingcart_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscribe',
+            index=models.Index(fields=['user', '-created'], name='subscribe_user_created_idx'),
+        ),
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='favoriterecipe_unique_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='shoppingcart_unique_user_recipe'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:54
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipes', 'FavoriteRecipe')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    Subscribe = apps.get_model('recipes', 'Subscribe')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(
+        favorites_count=count_subquery(FavoriteRecipe, 'recipe'),
+        shopping_cart_count=count_subquery(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(
+        followers_count=count_subquery(Subscribe, 'author'),
+        following_count=count_subquery(Subscribe, 'user'),
+        recipes_count=count_subquery(Recipe, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_hot_path_indexes'),
+        ('users', '0004_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:55
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_recipe_scores(apps, schema_editor):
+    """
+    Рейтинги существующих рецептов. Прежние добавления в избранное и
+    список покупок получают дату миграции, поэтому, как и в
+    compute_recipe_scores, рейтинг — их число без затухания.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    now = django.utils.timezone.now()
+    RecipeScore.objects.bulk_create(
+        RecipeScore(recipe_id=recipe_id, popular=score, trending=score,
+                    computed_at=now)
+        for recipe_id, score in Recipe.objects.values_list(
+            'id', F('favorites_count') + F('shopping_cart_count'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular', models.FloatField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Популярность за последние дни')),
+                ('computed_at', models.DateTimeField(verbose_name='Дата расчёта')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favoriterecipe',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popular', 'recipe'], name='recipescore_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', 'recipe'], name='recipescore_trending_idx'),
+        ),
+        migrations.RunPython(create_recipe_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:57
+
+import heapq
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+TIMELINE_LENGTH = 500
+FANOUT_FOLLOWERS_LIMIT = 1000
+
+
+def fill_timelines(apps, schema_editor):
+    """То же, что rebuild_timelines в recipes/services.py."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscribe = apps.get_model('recipes', 'Subscribe')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    recent = {}
+    for author_id, rows in groupby(Recipe.objects.order_by(
+            'author_id', '-pub_date', '-id').values_list(
+            'author_id', 'pub_date', 'id').iterator(), key=itemgetter(0)):
+        recent[author_id] = [
+            row[1:] for row in islice(rows, TIMELINE_LENGTH)]
+    # Рецепты авторов с большим числом подписчиков читаются при запросе
+    # ленты, а не рассылаются
+    subscriptions = Subscribe.objects.filter(
+        author__followers_count__lte=FANOUT_FOLLOWERS_LIMIT,
+    ).values_list('user_id', 'author_id').order_by('user_id')
+    for user_id, rows in groupby(subscriptions, key=itemgetter(0)):
+        timeline = heapq.merge(*(
+            [(pub_date, recipe_id, author_id)
+             for pub_date, recipe_id in recent.get(author_id, ())]
+            for _, author_id in rows
+        ), reverse=True)
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                          author_id=author_id, pub_date=pub_date)
+            for pub_date, recipe_id, author_id in islice(
+                timeline, TIMELINE_LENGTH)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0011_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_timeline_recipe'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:16
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEARCH_CONFIG = 'russian'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipesearch_vector_gin '
+            'ON recipes_recipesearch USING gin (vector)')
+        schema_editor.execute(f"""
+            INSERT INTO recipes_recipesearch (recipe_id, vector)
+            SELECT recipe.id,
+                setweight(to_tsvector('{SEARCH_CONFIG}', recipe.name), 'A')
+                || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(
+                    string_agg(ingredient.name, ' '), '')), 'B')
+                || setweight(to_tsvector('{SEARCH_CONFIG}', recipe.text), 'C')
+            FROM recipes_recipe recipe
+            LEFT JOIN recipes_ingredientamount amount
+                ON amount.recipe_id = recipe.id
+            LEFT JOIN recipes_ingredient ingredient
+                ON ingredient.id = amount.ingredient_id
+            GROUP BY recipe.id
+        """)
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+            'name, ingredients, text, '
+            "tokenize='unicode61 remove_diacritics 2')")
+        schema_editor.execute("""
+            INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+            SELECT recipe.id,
+                replace(replace(recipe.name, 'ё', 'е'), 'Ё', 'Е'),
+                replace(replace(coalesce(
+                    group_concat(ingredient.name, ' '), ''),
+                    'ё', 'е'), 'Ё', 'Е'),
+                replace(replace(recipe.text, 'ё', 'е'), 'Ё', 'Е')
+            FROM recipes_recipe recipe
+            LEFT JOIN recipes_ingredientamount amount
+                ON amount.recipe_id = recipe.id
+            LEFT JOIN recipes_ingredient ingredient
+                ON ingredient.id = amount.ingredient_id
+            GROUP BY recipe.id
+        """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS recipes_recipesearch_vector_gin')
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True, verbose_name='Поисковый документ')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ рецепта',
+                'verbose_name_plural': 'Поисковые документы рецептов',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
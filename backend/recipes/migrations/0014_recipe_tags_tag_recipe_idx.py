@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_search'),
+    ]
+
+    operations = [
+        # Индекс промежуточной таблицы тегов для поиска рецептов по тегу
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipes_recipe_tags_tag_recipe_idx',
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
@@ -105,11 +106,29 @@ class Recipe(models.Model):
         verbose_name='Дата публикации рецепта',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в избранное',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в список покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return f'Автор: {self.author.username} рецепт: {self.name}'
@@ -163,20 +182,27 @@ class AbstractBase(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+    )
 
     class Meta:
         abstract = True
-        ordering = ('user',)
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
-                name='unique favourite')]
+                name='%(class)s_unique_user_recipe')]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='%(class)s_recipe_user_idx')]
 
 
 class FavoriteRecipe(AbstractBase):
     """Модель избранных рецептов"""
 
-    class Meta:
+    class Meta(AbstractBase.Meta):
         default_related_name = 'favorite'
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
@@ -189,7 +215,7 @@ class FavoriteRecipe(AbstractBase):
 class ShoppingCart(AbstractBase):
     """Модель списка покупок"""
 
-    class Meta:
+    class Meta(AbstractBase.Meta):
         default_related_name = 'shopping_cart'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
@@ -227,7 +253,155 @@ class Subscribe(models.Model):
             models.UniqueConstraint(
                 fields=('user', 'author'),
                 name='unique_subscription')]
+        indexes = [
+            models.Index(
+                fields=('user', '-created'),
+                name='subscribe_user_created_idx')]
 
     def __str__(self):
         return (f'Пользователь: {self.user.username},'
                 f' автор: {self.author.username}')
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммы ингредиентов в списке покупок пользователя"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient')]
+
+    def __str__(self):
+        return (f'Пользователь: {self.user.username}, '
+                f'{self.ingredient.name} — {self.amount}')
+
+
+class RecipeScore(models.Model):
+    """Рейтинг рецепта по добавлениям в избранное и список покупок"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт',
+    )
+    popular = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+    )
+    trending = models.FloatField(
+        verbose_name='Популярность за последние дни',
+        default=0,
+    )
+    computed_at = models.DateTimeField(
+        verbose_name='Дата расчёта',
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=('-popular', 'recipe'),
+                name='recipescore_popular_idx'),
+            models.Index(
+                fields=('-trending', 'recipe'),
+                name='recipescore_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name}: {self.popular:.2f}'
+
+
+class RecipeSearch(models.Model):
+    """
+    Поисковый документ рецепта: название, названия ингредиентов
+    и описание. Используется на PostgreSQL, на SQLite документы
+    хранятся в таблице FTS5, см. recipes.search.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search',
+        verbose_name='Рецепт',
+    )
+    vector = SearchVectorField(
+        verbose_name='Поисковый документ',
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = 'Поисковый документ рецепта'
+        verbose_name_plural = 'Поисковые документы рецептов'
+
+    def __str__(self):
+        return self.recipe.name
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_recipe')]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx'),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return (f'Пользователь: {self.user.username}, '
+                f'рецепт: {self.recipe.name}')
@@ -0,0 +1,199 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import (Case, F, FloatField, IntegerField, Value,
+                              When)
+from django.db.models.expressions import RawSQL
+
+from .constants import INGREDIENT_SEARCH_LIMIT, SEARCH_CONFIG
+from .models import Ingredient
+from .services import on_commit_for_recipes
+
+# Веса названия, ингредиентов и описания в FTS5 относятся так же,
+# как веса A, B и C в ts_rank по умолчанию
+FTS_WEIGHTS = (1.0, 0.4, 0.2)
+# Окончания, которые отбрасываются у слов запроса на SQLite: в FTS5
+# нет русского стеммера, поэтому основа ищется как префикс
+RUSSIAN_ENDINGS = sorted((
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ой', 'ей',
+    'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ов', 'ев', 'ам',
+    'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'а', 'я', 'о', 'е', 'ы',
+    'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+UPDATE_DOCUMENTS_SQL = f"""
+    INSERT INTO recipes_recipesearch (recipe_id, vector)
+    SELECT recipe.id,
+        setweight(to_tsvector('{SEARCH_CONFIG}', recipe.name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(
+            string_agg(ingredient.name, ' '), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', recipe.text), 'C')
+    FROM recipes_recipe recipe
+    LEFT JOIN recipes_ingredientamount amount
+        ON amount.recipe_id = recipe.id
+    LEFT JOIN recipes_ingredient ingredient
+        ON ingredient.id = amount.ingredient_id
+    {{where}}
+    GROUP BY recipe.id
+    ON CONFLICT (recipe_id) DO UPDATE SET vector = EXCLUDED.vector
+"""
+UPDATE_FTS_SQL = """
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipe.id,
+        replace(replace(recipe.name, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(coalesce(
+            group_concat(ingredient.name, ' '), ''), 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(recipe.text, 'ё', 'е'), 'Ё', 'Е')
+    FROM recipes_recipe recipe
+    LEFT JOIN recipes_ingredientamount amount
+        ON amount.recipe_id = recipe.id
+    LEFT JOIN recipes_ingredient ingredient
+        ON ingredient.id = amount.ingredient_id
+    {where}
+    GROUP BY recipe.id
+"""
+
+
+class IngredientTrie:
+    """
+    Префиксное дерево названий ингредиентов в памяти процесса.
+    Ингредиенты хранятся в порядке сортировки базы данных, поэтому
+    результат поиска совпадает с поиском через SQL.
+    """
+
+    def __init__(self, ingredients):
+        self.ingredients = list(ingredients)
+        self.names = [
+            ingredient.name.upper() for ingredient in self.ingredients]
+        self.root = {}
+        for position, name in enumerate(self.names):
+            node = self.root
+            for char in name:
+                node = node.setdefault(char, {})
+                node.setdefault(None, []).append(position)
+
+    def prefix_positions(self, query):
+        node = self.root
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(None, [])
+
+    def search(self, query, limit):
+        query = query.upper()
+        positions = self.prefix_positions(query)[:limit]
+        if len(positions) < limit:
+            positions.extend(
+                position for position, name in enumerate(self.names)
+                if query in name and not name.startswith(query))
+        return [self.ingredients[position] for position in positions[:limit]]
+
+
+_trie = None
+
+
+def get_trie():
+    global _trie
+    if _trie is None:
+        _trie = IngredientTrie(Ingredient.objects.order_by('name', 'id'))
+    return _trie
+
+
+def reset_trie():
+    global _trie
+    _trie = None
+
+
+def search_ingredients_sql(query, limit):
+    """Поиск по индексу pg_trgm: сначала совпадения с начала названия."""
+    return list(Ingredient.objects.filter(
+        name__icontains=query,
+    ).annotate(
+        rank=Case(
+            When(name__istartswith=query, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ),
+    ).order_by('rank', 'name', 'id')[:limit])
+
+
+def search_ingredients(query, limit=INGREDIENT_SEARCH_LIMIT):
+    """
+    Ингредиенты, название которых начинается с query, затем
+    содержащие query. Не более limit результатов.
+    """
+    if connection.vendor == 'postgresql':
+        return search_ingredients_sql(query, limit)
+    return get_trie().search(query, limit)
+
+
+def update_search_documents(recipe_ids=None):
+    """
+    Пересобирает поисковые документы рецептов recipe_ids или всех
+    рецептов. Документы удалённых рецептов удаляются.
+    """
+    where, params = '', []
+    if recipe_ids is not None:
+        params = list(recipe_ids)
+        if not params:
+            return
+        where = f'WHERE recipe.id IN ({", ".join(["%s"] * len(params))})'
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(UPDATE_DOCUMENTS_SQL.format(where=where), params)
+            return
+        cursor.execute(
+            'DELETE FROM recipes_recipe_fts '
+            + where.replace('recipe.id', 'rowid'), params)
+        cursor.execute(UPDATE_FTS_SQL.format(where=where), params)
+
+
+def refresh_search_documents(recipe_ids):
+    """Обновляет документы рецептов после фиксации транзакции."""
+    on_commit_for_recipes(update_search_documents, recipe_ids)
+
+
+def stem(word):
+    for ending in RUSSIAN_ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def fts_query(query):
+    """Запрос FTS5: все слова query как префиксы их основ."""
+    words = re.findall(r'\w+', query.lower().replace('ё', 'е'))
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты queryset, найденные по названию, ингредиентам и описанию,
+    от наиболее подходящих: сначала совпадения в названии, затем
+    в ингредиентах и в описании.
+    """
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        queryset = queryset.filter(search__vector=search_query).annotate(
+            rank=SearchRank(F('search__vector'), search_query))
+    else:
+        query = fts_query(query)
+        if not query:
+            return queryset.none()
+        # Таблица FTS5 не описана моделью, поэтому отбор и ранг
+        # выражаются подзапросами: bm25() работает только в запросе
+        # с MATCH, а выражения RawSQL сочетаются с values() и курсором
+        matches = 'FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s'
+        weights = ', '.join(map(str, FTS_WEIGHTS))
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        queryset = queryset.filter(
+            id__in=RawSQL(f'SELECT rowid {matches}', [query]),
+        ).annotate(rank=RawSQL(
+            f'SELECT -bm25(recipes_recipe_fts, {weights}) {matches} '
+            f'AND rowid = {table}.id', [query],
+            output_field=FloatField()))
+    return queryset.order_by('-rank', '-pub_date', '-id')
@@ -0,0 +1,500 @@
+import heapq
+import math
+from collections import Counter
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import (Count, F, IntegerField, OuterRef, Q, Subquery,
+                              Sum)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from users.models import User
+from .constants import (FANOUT_FOLLOWERS_LIMIT, POPULAR_HALF_LIFE_DAYS,
+                        TIMELINE_LENGTH, TRENDING_HALF_LIFE_DAYS)
+from .models import (FavoriteRecipe, IngredientAmount, Recipe, RecipeScore,
+                     ShoppingCart, ShoppingCartIngredient, Subscribe,
+                     TimelineEntry)
+
+
+def bulk_create_in_batches(model, objs, batch_size=1000, **kwargs):
+    """
+    bulk_create для генератора объектов без загрузки их всех в память.
+    Возвращает число переданных объектов.
+    """
+    objs = iter(objs)
+    count = 0
+    while True:
+        batch = list(islice(objs, batch_size))
+        if not batch:
+            return count
+        model.objects.bulk_create(batch, **kwargs)
+        count += len(batch)
+
+
+class RecipesOnCommit:
+    """Вызов func(recipe_ids) после фиксации транзакции."""
+
+    def __init__(self, func):
+        self.func = func
+        self.recipe_ids = set()
+
+    def __call__(self):
+        self.func(self.recipe_ids)
+
+
+def on_commit_for_recipes(func, recipe_ids):
+    """
+    Вызывает func после фиксации транзакции один раз для всех рецептов,
+    переданных с этой func за транзакцию, вместо вызова на каждую
+    изменённую строку.
+    """
+    # Вызов, отменённый откатом точки сохранения, удаляется из
+    # run_on_commit, и тогда для следующих рецептов создаётся новый
+    for _, callback in transaction.get_connection().run_on_commit:
+        if isinstance(callback, RecipesOnCommit) and callback.func is func:
+            callback.recipe_ids.update(recipe_ids)
+            return
+    callback = RecipesOnCommit(func)
+    callback.recipe_ids.update(recipe_ids)
+    transaction.on_commit(callback)
+
+
+# Счётчики рецепта, которые меняются при добавлении в избранное
+# и в список покупок
+USER_RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def get_recipe_amounts(recipe_id):
+    """Количество каждого ингредиента рецепта: {ingredient_id: amount}."""
+    return dict(IngredientAmount.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+def apply_shopping_cart_deltas(user_ids, deltas, batch_size=1000):
+    """
+    Изменяет суммы ингредиентов в списках покупок пользователей
+    на величины из deltas: {ingredient_id: delta}.
+    Суммы меняются одним INSERT ... ON CONFLICT DO UPDATE с прибавлением
+    к значению в строке, поэтому одновременные изменения списка покупок
+    одного пользователя не теряют ни обновление, ни вставку.
+    """
+    user_ids = sorted(set(user_ids))
+    deltas = sorted(
+        (ingredient_id, delta)
+        for ingredient_id, delta in deltas.items() if delta)
+    if not user_ids or not deltas:
+        return
+    opts = ShoppingCartIngredient._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    columns = [quote(opts.get_field(name).column)
+               for name in ('user', 'ingredient', 'amount')]
+    user_column, ingredient_column, amount_column = columns
+    rows = [
+        (user_id, ingredient_id, delta)
+        for user_id in user_ids for ingredient_id, delta in deltas
+    ]
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(
+        columns, rows))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(
+                    f'INSERT INTO {table} ({", ".join(columns)}) '
+                    f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({user_column}, {ingredient_column}) '
+                    f'DO UPDATE SET {amount_column} = '
+                    f'{table}.{amount_column} + EXCLUDED.{amount_column}',
+                    [value for row in batch for value in row])
+        ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, amount__lte=0).delete()
+
+
+def add_to_shopping_cart_totals(user_id, recipe_id, sign=1):
+    """Добавляет (или вычитает при sign=-1) ингредиенты рецепта."""
+    apply_shopping_cart_deltas((user_id,), {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def add_recipes_to_shopping_cart_totals(user_id, recipe_ids, sign=1):
+    """add_to_shopping_cart_totals для нескольких рецептов сразу."""
+    apply_shopping_cart_deltas((user_id,), {
+        ingredient_id: sign * total
+        for ingredient_id, total in IngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).values('ingredient_id').annotate(
+            total=Sum('amount'),
+        ).values_list('ingredient_id', 'total').order_by()
+    })
+
+
+def user_recipes_changed(model, user_id, recipe_ids, sign):
+    """
+    Обновляет счётчики рецептов и суммы списка покупок после массового
+    добавления (sign=1) или удаления (sign=-1) рецептов recipe_ids
+    в избранное или список покупок: такие операции не вызывают сигналы.
+    """
+    if not recipe_ids:
+        return
+    change_counters(Recipe, recipe_ids, USER_RECIPE_COUNTERS[model], sign)
+    if model is ShoppingCart:
+        add_recipes_to_shopping_cart_totals(user_id, recipe_ids, sign)
+
+
+def add_user_recipes(model, user_id, recipe_ids):
+    """
+    Добавляет рецепты в избранное или список покупок (model) одним
+    INSERT ... ON CONFLICT DO NOTHING RETURNING. Возвращает множества
+    добавленных рецептов и рецептов, которые уже были добавлены.
+    Несуществующие рецепты пропускаются. Счётчики и суммы списка
+    покупок меняются только для действительно вставленных строк,
+    поэтому одновременные запросы с теми же рецептами не учитываются
+    дважды.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return set(), set()
+    opts = model._meta
+    recipe_opts = Recipe._meta
+    quote = connection.ops.quote_name
+    user_column = quote(opts.get_field('user').column)
+    recipe_column = quote(opts.get_field('recipe').column)
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} '
+        f'({user_column}, {recipe_column}, '
+        f'{quote(opts.get_field("created").column)}) '
+        f'SELECT %s, {quote(recipe_opts.pk.column)}, %s '
+        f'FROM {quote(recipe_opts.db_table)} '
+        f'WHERE {quote(recipe_opts.pk.column)} '
+        f'IN ({", ".join(["%s"] * len(recipe_ids))}) '
+        f'ON CONFLICT ({user_column}, {recipe_column}) DO NOTHING '
+        f'RETURNING {recipe_column}'
+    )
+    created = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, created, *recipe_ids])
+            new = {recipe_id for recipe_id, in cursor.fetchall()}
+        existing = set(model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids,
+        ).values_list('recipe_id', flat=True)) - new
+        user_recipes_changed(model, user_id, new, 1)
+    return new, existing
+
+
+def remove_user_recipes(model, user_id, recipe_ids):
+    """
+    Удаляет рецепты из избранного или списка покупок (model) одним
+    DELETE ... RETURNING. Возвращает множество удалённых рецептов.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return set()
+    opts = model._meta
+    quote = connection.ops.quote_name
+    recipe_column = quote(opts.get_field('recipe').column)
+    sql = (
+        f'DELETE FROM {quote(opts.db_table)} '
+        f'WHERE {quote(opts.get_field("user").column)} = %s '
+        f'AND {recipe_column} IN ({", ".join(["%s"] * len(recipe_ids))}) '
+        f'RETURNING {recipe_column}'
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, *recipe_ids])
+            removed = {recipe_id for recipe_id, in cursor.fetchall()}
+        user_recipes_changed(model, user_id, removed, -1)
+    return removed
+
+
+def update_recipe_in_shopping_carts(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение ингредиентов рецепта во все списки покупок."""
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_shopping_cart_deltas(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True),
+        deltas,
+    )
+
+
+def calculate_shopping_cart_totals():
+    """Суммы ингредиентов списков покупок, посчитанные по корзинам."""
+    return IngredientAmount.objects.filter(
+        recipe__shopping_cart__isnull=False,
+    ).values(
+        'ingredient_id',
+        user_id=F('recipe__shopping_cart__user'),
+    ).annotate(
+        total=Sum('amount'),
+    ).values_list('user_id', 'ingredient_id', 'total').order_by()
+
+
+def rebuild_shopping_cart_totals(batch_size=1000):
+    """Полностью пересчитывает суммы ингредиентов списков покупок."""
+    with transaction.atomic():
+        ShoppingCartIngredient.objects.all().delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            (ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total)
+             for user_id, ingredient_id, total
+             in calculate_shopping_cart_totals().iterator()),
+            batch_size=batch_size,
+        )
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик field объекта на delta."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    """Количество объектов model, ссылающихся полем field на объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарно изменяет счётчик field объектов pks на delta."""
+    model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def get_counters():
+    """Модель, поле счётчика и выражение для его пересчёта."""
+    return (
+        (Recipe, 'favorites_count', count_subquery(FavoriteRecipe, 'recipe')),
+        (Recipe, 'shopping_cart_count',
+         count_subquery(ShoppingCart, 'recipe')),
+        (User, 'followers_count', count_subquery(Subscribe, 'author')),
+        (User, 'following_count', count_subquery(Subscribe, 'user')),
+        (User, 'recipes_count', count_subquery(Recipe, 'author')),
+    )
+
+
+def reconcile_counters(check=False):
+    """
+    Сверяет счётчики с фактическими данными и исправляет расхождения.
+    Возвращает число расходящихся объектов для каждого счётчика.
+    """
+    mismatches = {}
+    for model, field, actual in get_counters():
+        mismatched = model.objects.annotate(
+            actual=actual).exclude(**{field: F('actual')}).count()
+        if mismatched and not check:
+            model.objects.update(**{field: actual})
+        mismatches[f'{model._meta.verbose_name}: {field}'] = mismatched
+    return mismatches
+
+
+def decay(age_days, half_life_days):
+    return math.pow(0.5, age_days / half_life_days)
+
+
+def compute_recipe_scores(now=None, batch_size=1000):
+    """
+    Пересчитывает рейтинги всех рецептов: добавления в избранное и список
+    покупок, сгруппированные по дням, с экспоненциальным затуханием.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    scores = {
+        recipe_id: [0.0, 0.0]
+        for recipe_id in Recipe.objects.values_list('id', flat=True)
+    }
+    for model in (FavoriteRecipe, ShoppingCart):
+        events = model.objects.annotate(
+            day=TruncDate('created'),
+        ).values('recipe_id', 'day').annotate(
+            count=Count('pk'),
+        ).values_list('recipe_id', 'day', 'count').order_by()
+        for recipe_id, day, count in events.iterator():
+            age_days = max((today - day).days, 0)
+            score = scores.setdefault(recipe_id, [0.0, 0.0])
+            score[0] += count * decay(age_days, POPULAR_HALF_LIFE_DAYS)
+            score[1] += count * decay(age_days, TRENDING_HALF_LIFE_DAYS)
+    with transaction.atomic():
+        RecipeScore.objects.all().delete()
+        RecipeScore.objects.bulk_create(
+            (RecipeScore(recipe_id=recipe_id, popular=popular,
+                         trending=trending, computed_at=now)
+             for recipe_id, (popular, trending) in scores.items()),
+            batch_size=batch_size,
+        )
+    return len(scores)
+
+
+def is_prolific(author_id):
+    """Рецепты автора читаются при запросе ленты, а не рассылаются."""
+    return User.objects.filter(
+        pk=author_id, followers_count__gt=FANOUT_FOLLOWERS_LIMIT).exists()
+
+
+def trim_timelines(user_ids=None):
+    """
+    Оставляет в лентах пользователей user_ids или всех пользователей
+    TIMELINE_LENGTH новых рецептов. Из ленты, которая длиннее, удаляются
+    записи старше последней оставляемой. Возвращает число удалённых.
+    """
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    overfull = list(entries.order_by().values('user_id').annotate(
+        count=Count('pk'),
+    ).filter(count__gt=TIMELINE_LENGTH).values_list('user_id', flat=True))
+    deleted = 0
+    for user_id in overfull:
+        timeline = TimelineEntry.objects.filter(user_id=user_id)
+        pub_date, recipe_id = timeline.order_by(
+            '-pub_date', '-recipe').values_list(
+            'pub_date', 'recipe_id')[TIMELINE_LENGTH - 1]
+        deleted += timeline.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id)
+        ).delete()[0]
+    return deleted
+
+
+def fan_out_recipe(recipe, batch_size=1000):
+    """
+    Добавляет новый рецепт в ленты подписчиков автора. Ленты не
+    обрезаются: это делает периодическая команда trim_timelines.
+    """
+    if is_prolific(recipe.author_id):
+        return
+    follower_ids = list(Subscribe.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe=recipe,
+                       author_id=recipe.author_id, pub_date=recipe.pub_date)
+         for user_id in follower_ids),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def add_author_to_timeline(user_id, author_id):
+    """Добавляет в ленту пользователя последние рецепты автора."""
+    if is_prolific(author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+         for recipe_id, pub_date in Recipe.objects.filter(
+             author_id=author_id
+        ).order_by('-pub_date').values_list(
+             'id', 'pub_date')[:TIMELINE_LENGTH]),
+        ignore_conflicts=True,
+    )
+    trim_timelines((user_id,))
+
+
+def remove_author_from_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_timelines(batch_size=1000):
+    """
+    Заново заполняет ленты подписок: для каждого пользователя
+    TIMELINE_LENGTH новых рецептов его авторов.
+    """
+    recent = {}
+    for author_id, rows in groupby(Recipe.objects.order_by(
+            'author_id', '-pub_date', '-id').values_list(
+            'author_id', 'pub_date', 'id').iterator(), key=itemgetter(0)):
+        recent[author_id] = [
+            row[1:] for row in islice(rows, TIMELINE_LENGTH)]
+    subscriptions = Subscribe.objects.filter(
+        author__followers_count__lte=FANOUT_FOLLOWERS_LIMIT,
+    ).values_list('user_id', 'author_id').order_by('user_id')
+
+    def entries():
+        for user_id, rows in groupby(
+                subscriptions.iterator(), key=itemgetter(0)):
+            timeline = heapq.merge(*(
+                [(pub_date, recipe_id, author_id)
+                 for pub_date, recipe_id in recent.get(author_id, ())]
+                for _, author_id in rows
+            ), reverse=True)
+            for pub_date, recipe_id, author_id in islice(
+                    timeline, TIMELINE_LENGTH):
+                yield TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                                    author_id=author_id, pub_date=pub_date)
+
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        bulk_create_in_batches(TimelineEntry, entries(), batch_size)
+
+
+def get_prolific_authors(user):
+    """
+    Авторы, на которых подписан пользователь и рецепты которых
+    читаются при запросе ленты: {author_id: recipes_count}.
+    """
+    return dict(Subscribe.objects.filter(
+        user=user,
+        author__followers_count__gt=FANOUT_FOLLOWERS_LIMIT,
+    ).values_list('author_id', 'author__recipes_count').order_by())
+
+
+def keyset_after(id_field, values, reverse=False):
+    """
+    Условие «после (pub_date, id) = values» при сортировке
+    по убыванию или, при reverse, по возрастанию.
+    """
+    pub_date, pk = values
+    lookup = 'gt' if reverse else 'lt'
+    return (Q(**{f'pub_date__{lookup}': pub_date})
+            | Q(pub_date=pub_date, **{f'{id_field}__{lookup}': pk}))
+
+
+def get_feed(user, queryset, prolific_authors, keyset=None, limit=None):
+    """
+    Рецепты queryset из ленты подписок пользователя и рецепты авторов
+    prolific_authors, для которых лента формируется при чтении.
+    keyset — (reverse, values) постраничного вывода по (pub_date, id).
+    С limit из ленты и у каждого такого автора берётся не больше limit
+    рецептов после курсора по индексам (user, -pub_date, -recipe)
+    и (author, -pub_date), поэтому стоимость страницы не зависит
+    от длины ленты и числа рецептов авторов.
+    """
+    reverse, values = keyset or (False, None)
+    prefix = '' if reverse else '-'
+    sources = [(TimelineEntry.objects.filter(user=user), 'recipe_id')]
+    sources += [
+        (Recipe.objects.filter(author_id=author_id), 'id')
+        for author_id in prolific_authors
+    ]
+    condition = Q()
+    for source, id_field in sources:
+        if values is not None:
+            source = source.filter(keyset_after(id_field, values, reverse))
+        source = source.order_by(
+            f'{prefix}pub_date', f'{prefix}{id_field}').values(id_field)
+        if limit is not None:
+            source = source[:limit]
+        condition |= Q(id__in=source)
+    return queryset.filter(condition)
+
+
+def count_feed(user, prolific_authors):
+    """
+    Число рецептов ленты по счётчикам рецептов авторов, без подсчёта
+    по таблице рецептов.
+    """
+    return TimelineEntry.objects.filter(user=user).exclude(
+        author_id__in=prolific_authors,
+    ).count() + sum(prolific_authors.values())
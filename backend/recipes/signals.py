@@ -0,0 +1,110 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import User
+from .models import (FavoriteRecipe, Ingredient, IngredientAmount, Recipe,
+                     RecipeScore, ShoppingCart, Subscribe)
+from .matching import refresh_index
+from .search import refresh_search_documents, reset_trie
+from .services import (USER_RECIPE_COUNTERS, add_author_to_timeline,
+                       add_to_shopping_cart_totals, change_counter,
+                       fan_out_recipe, remove_author_from_timeline)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_shopping_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        add_to_shopping_cart_totals(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_shopping_cart_totals(sender, instance, **kwargs):
+    add_to_shopping_cart_totals(
+        instance.user_id, instance.recipe_id, sign=-1)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_ingredient_search(sender, **kwargs):
+    reset_trie()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def refresh_recipe_search(sender, instance, **kwargs):
+    refresh_search_documents((instance.pk,))
+    refresh_index((instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def refresh_recipe_ingredients_search(sender, instance, **kwargs):
+    refresh_search_documents((instance.recipe_id,))
+    refresh_index((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_recipes_search(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_documents(IngredientAmount.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counters(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, USER_RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counters(sender, instance, **kwargs):
+    change_counter(
+        Recipe, instance.recipe_id, USER_RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Subscribe)
+def increase_subscribe_counters(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+        change_counter(User, instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def decrease_subscribe_counters(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+    change_counter(User, instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(
+            recipe=instance, computed_at=instance.pub_date)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscribe)
+def add_author_recipes_to_timeline(sender, instance, created, **kwargs):
+    if created:
+        add_author_to_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def remove_author_recipes_from_timeline(sender, instance, **kwargs):
+    remove_author_from_timeline(instance.user_id, instance.author_id)
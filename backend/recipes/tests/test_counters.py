@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.tests.utils import RecipesDataMixin
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Subscribe
+from recipes.services import reconcile_counters
+from users.models import User
+
+
+class CountersTests(RecipesDataMixin, TestCase):
+    """Счётчики меняются вместе с данными и сверяются reconcile_counters."""
+
+    def assert_consistent(self):
+        self.assertEqual(
+            set(reconcile_counters(check=True).values()), {0})
+
+    def get_counters(self, recipe, *users):
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        return (
+            recipe.favorites_count, recipe.shopping_cart_count,
+            *(User.objects.filter(pk=user.pk).values_list(
+                'followers_count', 'following_count', 'recipes_count',
+            ).get() for user in users),
+        )
+
+    def test_add_and_remove(self):
+        self.assert_consistent()
+        user, author = self.users[1], self.users[2]
+        recipe = Recipe.objects.create(
+            author=author, name='Новый рецепт', text='Описание',
+            cooking_time=5, image='recipes/images/recipe.png')
+        self.assertEqual(
+            self.get_counters(recipe, user, author),
+            (0, 0, (1, 0, 3), (1, 0, 4)))
+        FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        Subscribe.objects.create(user=user, author=author)
+        self.assertEqual(
+            self.get_counters(recipe, user, author),
+            (1, 1, (1, 1, 3), (2, 0, 4)))
+        self.assert_consistent()
+        FavoriteRecipe.objects.filter(user=user, recipe=recipe).delete()
+        Subscribe.objects.filter(user=user, author=author).delete()
+        self.assertEqual(
+            self.get_counters(recipe, user, author),
+            (0, 1, (1, 0, 3), (1, 0, 4)))
+        recipe.delete()
+        self.assertEqual(
+            self.get_counters(self.recipes[0], author)[2], (1, 0, 3))
+        self.assert_consistent()
+
+    def test_bulk_endpoints(self):
+        client = self.get_client(self.users[1])
+        recipe_ids = [recipe.id for recipe in self.recipes[:3]]
+        for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/'):
+            with self.subTest(url=url):
+                response = client.post(
+                    url, {'recipes': recipe_ids}, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assert_consistent()
+                response = client.delete(
+                    url, {'recipes': recipe_ids[:2]}, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assert_consistent()
+
+    def test_reconcile(self):
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(
+            favorites_count=100)
+        User.objects.filter(pk=self.user.pk).update(following_count=0)
+        mismatches = reconcile_counters(check=True)
+        self.assertEqual(sum(mismatches.values()), 2)
+        with self.assertRaises(CommandError):
+            call_command(
+                'reconcile_counters', '--check', stdout=StringIO())
+        self.assertEqual(reconcile_counters(), mismatches)
+        self.assert_consistent()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipes[1].pk).favorites_count, 1)
@@ -0,0 +1,39 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.images import rendition_names, rendition_urls
+from recipes.models import Recipe
+
+
+class GenerateDatasetTests(TestCase):
+    """Рецепты синтетических данных ссылаются на сохранённое изображение."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+    def test_image(self):
+        call_command(
+            'generate_dataset', '--users', '3', '--recipes', '5',
+            '--ingredients', '2', '--favorites', '1', '--shopping-cart', '1',
+            '--subscriptions', '1', stdout=StringIO())
+        names = set(Recipe.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(default_storage.exists(name))
+        paths = rendition_names(name)
+        self.assertTrue(all(map(default_storage.exists, paths.values())))
+        self.assertEqual(
+            rendition_urls(name),
+            {rendition: default_storage.url(path)
+             for rendition, path in paths.items()})
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.tests.utils import RecipesDataMixin
+from recipes.management.commands.import_data import FIXTURE_MODELS
+from recipes.models import FavoriteRecipe, Ingredient, Recipe, Tag
+from recipes.services import reconcile_counters
+
+INGREDIENTS_CSV = (
+    'name,measurement_unit\n'
+    'соль,г\n'
+    ' перец ,г\n'
+    'соль,г\n'
+    'сахар,г\n'
+    ',г\n'
+    'молоко,мл\n'
+)
+
+
+class ImportDataTests(RecipesDataMixin, TestCase):
+    """Повторная загрузка ничего не дублирует и сообщает о пропусках."""
+
+    def write_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_data(self, *args):
+        stdout = StringIO()
+        call_command('import_data', *args, stdout=stdout)
+        return stdout.getvalue().splitlines()
+
+    def import_fixture(self, path):
+        """Результаты загрузки дампа по моделям."""
+        return dict(
+            line.split(': ', 1) for line in self.import_data(path)
+            if ': ' in line)
+
+    def test_ingredients_csv(self):
+        path = self.write_file('.csv', INGREDIENTS_CSV)
+        before = Ingredient.objects.count()
+        self.assertEqual(
+            self.import_data(path, '--batch-size', '2')[0],
+            'ingredients: добавлено - 4, обновлено - 0, пропущено - 0')
+        self.assertEqual(Ingredient.objects.count(), before + 4)
+        self.assertTrue(Ingredient.objects.filter(name='перец').exists())
+        self.assertEqual(
+            self.import_data(path)[0],
+            'ingredients: добавлено - 0, обновлено - 0, пропущено - 4')
+        self.assertEqual(Ingredient.objects.count(), before + 4)
+
+    def test_update_ingredients(self):
+        self.import_data(self.write_file('.csv', INGREDIENTS_CSV))
+        path = self.write_file('.csv', 'name,measurement_unit\nсахар,кг\n')
+        self.assertEqual(
+            self.import_data(path, '--update')[0],
+            'ingredients: добавлено - 0, обновлено - 1, пропущено - 0')
+        self.assertEqual(
+            Ingredient.objects.get(name='сахар').measurement_unit, 'кг')
+
+    def test_tags_json(self):
+        path = self.write_file('.json', json.dumps([
+            {'name': 'Завтрак', 'color': '#E26C2D', 'slug': 'breakfast'},
+            {'name': 'Тег 0', 'color': '#FFFFFF', 'slug': 'tag0'},
+        ]))
+        self.assertEqual(
+            self.import_data(path, '--model', 'tags')[0],
+            'tags: добавлено - 1, обновлено - 0, пропущено - 1')
+        self.assertEqual(
+            self.import_data(path, '--model', 'tags')[0],
+            'tags: добавлено - 0, обновлено - 0, пропущено - 2')
+        self.assertEqual(Tag.objects.count(), len(self.tags) + 1)
+
+    def test_fixture(self):
+        stdout = StringIO()
+        call_command(
+            'dumpdata', *FIXTURE_MODELS, format='json', stdout=stdout)
+        path = self.write_file('.json', stdout.getvalue())
+        counts = {
+            model: model.objects.count()
+            for model in (Recipe, FavoriteRecipe, Ingredient)
+        }
+        self.recipes[-1].delete()
+        FavoriteRecipe.objects.filter(recipe=self.recipes[1]).delete()
+        results = self.import_fixture(path)
+        self.assertEqual(
+            results['recipes.recipe'],
+            'добавлено - 1, обновлено - 0, пропущено - 11')
+        self.assertEqual(
+            results['recipes.favoriterecipe'],
+            'добавлено - 1, обновлено - 0, пропущено - 4')
+        self.assertEqual(
+            {model: model.objects.count() for model in counts}, counts)
+        self.assertEqual(set(reconcile_counters(check=True).values()), {0})
+        self.assertEqual(
+            self.import_fixture(path)['recipes.recipe'],
+            'добавлено - 0, обновлено - 0, пропущено - 12')
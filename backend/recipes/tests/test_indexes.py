@@ -0,0 +1,57 @@
+from django.db import connection
+from django.test import TestCase
+
+from recipes.models import (FavoriteRecipe, IngredientAmount, Recipe,
+                            ShoppingCart, Subscribe)
+
+# Описание запроса, функция построения запроса и подходящие индексы.
+# SQLite создаёт уникальные ограничения как sqlite_autoindex_*.
+QUERIES = (
+    ('Лента рецептов',
+     lambda: Recipe.objects.order_by('-pub_date', '-id')[:6],
+     ('recipe_pub_date_id_idx',)),
+    ('Лента по популярности',
+     lambda: Recipe.objects.filter(score__isnull=False).order_by(
+         '-score__trending', '-pub_date', '-id')[:6],
+     ('recipescore_trending_idx',)),
+    ('Рецепты автора',
+     lambda: Recipe.objects.filter(author_id=1).order_by('-pub_date'),
+     ('recipe_author_pub_date_idx',)),
+    ('Избранное пользователя',
+     lambda: FavoriteRecipe.objects.filter(user_id=1, recipe_id=1),
+     ('favoriterecipe_unique_user_recipe',
+      'sqlite_autoindex_recipes_favoriterecipe')),
+    ('Пользователи, добавившие рецепт в избранное',
+     lambda: FavoriteRecipe.objects.filter(recipe_id=1).values('user_id'),
+     ('favoriterecipe_recipe_user_idx',)),
+    ('Список покупок пользователя',
+     lambda: ShoppingCart.objects.filter(user_id=1, recipe_id=1),
+     ('shoppingcart_unique_user_recipe',
+      'sqlite_autoindex_recipes_shoppingcart')),
+    ('Пользователи, добавившие рецепт в список покупок',
+     lambda: ShoppingCart.objects.filter(recipe_id=1).values('user_id'),
+     ('shoppingcart_recipe_user_idx',)),
+    ('Подписки пользователя',
+     lambda: Subscribe.objects.filter(user_id=1).order_by('-created'),
+     ('subscribe_user_created_idx',)),
+    ('Ингредиенты рецептов',
+     lambda: IngredientAmount.objects.filter(recipe_id=1).order_by(),
+     ('unique ingredient', 'recipes_ingredientamount_recipe_id')),
+)
+
+
+class IndexUsageTests(TestCase):
+    """Запросы горячих путей используют индексы по планам EXPLAIN."""
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor == 'postgresql':
+            # На пустых таблицах PostgreSQL выбирает полный просмотр
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for description, query, indexes in QUERIES:
+            with self.subTest(description):
+                plan = query().explain()
+                self.assertTrue(
+                    any(index in plan for index in indexes),
+                    f'Не используется ни один из индексов '
+                    f'{", ".join(indexes)}:\n{plan}')
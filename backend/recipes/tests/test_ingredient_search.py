@@ -0,0 +1,52 @@
+from django.test import TestCase
+
+from recipes.models import Ingredient
+from recipes.search import (IngredientTrie, get_trie, reset_trie,
+                            search_ingredients, search_ingredients_sql)
+
+# LIKE в SQLite не учитывает регистр только для латиницы, поэтому
+# кириллические запросы заданы в регистре названий
+NAMES = (
+    'Apple', 'apple juice', 'Pineapple', 'APPLESAUCE', 'Grape', 'Grapefruit',
+    'соль', 'морская соль', 'соль крупная', 'Сахар', 'сахарная пудра',
+)
+QUERIES = ('app', 'APP', 'apple', 'le', 'grape', 'ape', 'x', 'соль', 'оль',
+           'ахар', 'а')
+
+
+class IngredientSearchTests(TestCase):
+    """Поиск по префиксному дереву совпадает с поиском через SQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in NAMES)
+
+    def setUp(self):
+        # Дерево могли построить по данным других тестов
+        reset_trie()
+
+    def test_trie_matches_sql(self):
+        trie = IngredientTrie(Ingredient.objects.order_by('name', 'id'))
+        for query in QUERIES:
+            for limit in (1, 2, 10):
+                with self.subTest(query=query, limit=limit):
+                    self.assertEqual(
+                        trie.search(query, limit),
+                        search_ingredients_sql(query, limit))
+
+    def test_prefix_matches_first(self):
+        names = [
+            ingredient.name for ingredient in search_ingredients('apple')]
+        # Порядок внутри групп зависит от правил сортировки базы
+        self.assertEqual(
+            set(names[:3]), {'Apple', 'apple juice', 'APPLESAUCE'})
+        self.assertEqual(names[3:], ['Pineapple'])
+
+    def test_trie_reset_on_change(self):
+        get_trie()
+        ingredient = Ingredient.objects.create(
+            name='Applejack', measurement_unit='мл')
+        self.assertIn(ingredient, search_ingredients('applej'))
+        ingredient.delete()
+        self.assertEqual(search_ingredients('applej'), [])
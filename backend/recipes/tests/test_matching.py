@@ -0,0 +1,45 @@
+from itertools import combinations
+
+from django.test import TestCase
+
+from api.tests.utils import RecipesDataMixin
+from recipes import matching
+from recipes.matching import IngredientIndex, match_recipes_sql
+from recipes.models import IngredientAmount
+
+
+def build_index():
+    return IngredientIndex(IngredientAmount.objects.values_list(
+        'recipe_id', 'ingredient_id').order_by())
+
+
+class IngredientMatchingTests(RecipesDataMixin, TestCase):
+    """Подбор через индекс в памяти совпадает с подбором через SQL."""
+
+    def assert_parity(self, index):
+        ingredient_ids = [ingredient.id for ingredient in self.ingredients]
+        for size in (1, 2, 3, 5):
+            for pantry in combinations(ingredient_ids, size):
+                for missing in (0, 1, 2):
+                    with self.subTest(pantry=pantry, missing=missing):
+                        self.assertEqual(
+                            index.match(pantry, missing),
+                            match_recipes_sql(pantry, missing))
+
+    def test_index_matches_sql(self):
+        self.assert_parity(build_index())
+
+    def test_updated_index_matches_sql(self):
+        index = build_index()
+        recipe, other = self.recipes[0], self.recipes[1]
+        IngredientAmount.objects.filter(
+            recipe=recipe, ingredient=self.ingredients[1]).delete()
+        IngredientAmount.objects.create(
+            recipe=recipe, ingredient=self.ingredients[5], amount=1)
+        IngredientAmount.objects.filter(recipe=other).delete()
+        matching._index = index
+        self.addCleanup(setattr, matching, '_index', None)
+        matching.update_index((recipe.id, other.id))
+        self.assertNotIn(other.id, index.recipes)
+        self.assertEqual(index.recipes, build_index().recipes)
+        self.assert_parity(index)
@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from api.tests.utils import RecipesDataMixin
+from recipes.models import Recipe
+from recipes.search import search_recipes, update_search_documents
+
+
+class SearchRecipesTests(RecipesDataMixin, TestCase):
+    """Поиск ранжирует совпадения и сочетается с values() и фильтрами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        author = cls.users[1]
+        cls.in_name, cls.in_text = (
+            Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=5,
+                image='recipes/images/recipe.png')
+            for name, text in (('Борщ', 'Описание'),
+                               ('Суп', 'Почти как борщ'))
+        )
+        update_search_documents()
+
+    def search(self, query, queryset=None):
+        return search_recipes(
+            Recipe.objects.all() if queryset is None else queryset, query)
+
+    def test_rank(self):
+        self.assertEqual(
+            list(self.search('борщи').values_list('id', flat=True)),
+            [self.in_name.id, self.in_text.id])
+
+    def test_values_and_filters(self):
+        rows = list(self.search('борщ').values('id', 'rank'))
+        self.assertEqual(
+            [row['id'] for row in rows], [self.in_name.id, self.in_text.id])
+        self.assertGreater(rows[0]['rank'], rows[1]['rank'])
+        after = self.search('борщ').filter(rank__lt=rows[0]['rank'])
+        self.assertEqual(
+            list(after.values_list('id', flat=True)), [self.in_text.id])
+        self.assertEqual(self.search('борщ').count(), 2)
+        self.assertEqual(
+            self.search('борщ', Recipe.objects.filter(
+                author=self.users[0])).count(), 0)
+
+    def test_empty_query(self):
+        self.assertEqual(self.search('  ').count(), 0)
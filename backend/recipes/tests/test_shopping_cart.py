@@ -0,0 +1,65 @@
+from django.test import TestCase
+
+from api.tests.utils import RecipesDataMixin
+from recipes.models import (FavoriteRecipe, Recipe, ShoppingCart,
+                            ShoppingCartIngredient)
+from recipes.services import (add_user_recipes, apply_shopping_cart_deltas,
+                              calculate_shopping_cart_totals,
+                              remove_user_recipes, user_recipes_changed)
+
+
+class ShoppingCartTotalsTests(RecipesDataMixin, TestCase):
+    """Суммы ингредиентов совпадают с посчитанными по спискам покупок."""
+
+    def assert_totals_match(self):
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount')),
+            set(calculate_shopping_cart_totals()))
+
+    def test_add_and_remove_recipes(self):
+        self.assert_totals_match()
+        ShoppingCart.objects.create(user=self.users[1], recipe=self.recipes[0])
+        add_user_recipes(ShoppingCart, self.users[1].id,
+                         [recipe.id for recipe in self.recipes[:4]])
+        self.assert_totals_match()
+        remove_user_recipes(ShoppingCart, self.users[1].id,
+                            [recipe.id for recipe in self.recipes[1:3]])
+        ShoppingCart.objects.filter(
+            user=self.user, recipe=self.recipes[1]).delete()
+        self.assert_totals_match()
+
+    def test_apply_deltas(self):
+        user_ids = [user.id for user in self.users[1:3]]
+        ingredient_id = self.ingredients[0].id
+        apply_shopping_cart_deltas(user_ids, {ingredient_id: 5})
+        apply_shopping_cart_deltas(user_ids, {ingredient_id: 3})
+        amounts = ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id=ingredient_id)
+        self.assertEqual(
+            sorted(amounts.values_list('amount', flat=True)), [8, 8])
+        apply_shopping_cart_deltas(user_ids, {ingredient_id: -8})
+        self.assertFalse(amounts.exists())
+
+    def test_add_same_recipes_twice(self):
+        user = self.users[1]
+        recipe_ids = [recipe.id for recipe in self.recipes[:4]]
+        for model, counter in ((ShoppingCart, 'shopping_cart_count'),
+                               (FavoriteRecipe, 'favorites_count')):
+            with self.subTest(model=model.__name__):
+                counters = Recipe.objects.filter(
+                    id__in=recipe_ids).values_list('id', counter)
+                expected = {
+                    recipe_id: count + 1 for recipe_id, count in counters}
+                # Первый рецепт уже добавил параллельный запрос
+                model.objects.bulk_create(
+                    [model(user=user, recipe_id=recipe_ids[0])])
+                user_recipes_changed(model, user.id, recipe_ids[:1], 1)
+                self.assertEqual(
+                    add_user_recipes(model, user.id, recipe_ids + [0]),
+                    (set(recipe_ids[1:]), {recipe_ids[0]}))
+                self.assertEqual(
+                    add_user_recipes(model, user.id, recipe_ids),
+                    (set(), set(recipe_ids)))
+                self.assertEqual(dict(counters.all()), expected)
+        self.assert_totals_match()
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from api.tests.utils import RecipesDataMixin
+from recipes.constants import FANOUT_FOLLOWERS_LIMIT
+from recipes.models import Recipe, Subscribe, TimelineEntry
+from recipes.services import trim_timelines
+from users.models import User
+
+
+@override_settings(API_RESPONSE_CACHE=False)
+class TimelineTests(RecipesDataMixin, TestCase):
+    """Ленты подписок: рассылка, отписка, авторы без рассылки, обрезка."""
+
+    def create_recipe(self, author):
+        return Recipe.objects.create(
+            author=author, name='Новый рецепт', text='Описание',
+            cooking_time=5, image='recipes/images/recipe.png')
+
+    def get_timeline(self, user):
+        return set(TimelineEntry.objects.filter(
+            user=user).values_list('recipe_id', flat=True))
+
+    def get_expected_feed(self, user):
+        return list(Recipe.objects.filter(
+            author__following__user=user,
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def get_feed(self, user, limit=5):
+        """id рецептов ленты по всем страницам и count ответа."""
+        client = self.get_client(user)
+        url = f'/api/recipes/feed/?limit={limit}'
+        recipe_ids = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            recipe_ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return recipe_ids, response.data['count']
+
+    def assert_feed(self, user):
+        expected = self.get_expected_feed(user)
+        self.assertEqual(self.get_feed(user), (expected, len(expected)))
+
+    def test_fan_out(self):
+        recipe = self.create_recipe(self.users[1])
+        self.assertIn(recipe.id, self.get_timeline(self.user))
+        self.assertNotIn(recipe.id, self.get_timeline(self.users[2]))
+        self.assertEqual(self.get_feed(self.user)[0][0], recipe.id)
+        self.assert_feed(self.user)
+
+    def test_subscribe_and_unsubscribe(self):
+        user, author = self.users[1], self.users[2]
+        Subscribe.objects.create(user=user, author=author)
+        self.assertEqual(
+            self.get_timeline(user),
+            set(author.recipe.values_list('id', flat=True)))
+        self.assert_feed(user)
+        Subscribe.objects.filter(user=self.user, author=author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, author=author).exists())
+        self.assert_feed(self.user)
+
+    def test_prolific_author(self):
+        author = self.users[3]
+        User.objects.filter(pk=author.pk).update(
+            followers_count=FANOUT_FOLLOWERS_LIMIT + 1)
+        recipe = self.create_recipe(author)
+        self.assertNotIn(recipe.id, self.get_timeline(self.user))
+        # Рецепты автора читаются при запросе, а не из ленты
+        TimelineEntry.objects.filter(author=author).delete()
+        for limit in (1, 2, 5):
+            with self.subTest(limit=limit):
+                expected = self.get_expected_feed(self.user)
+                self.assertEqual(
+                    self.get_feed(self.user, limit),
+                    (expected, len(expected)))
+
+    def test_feed_with_filters(self):
+        response = self.get_client(self.user).get(
+            '/api/recipes/feed/?limit=2&tags=tag2')
+        expected = list(Recipe.objects.filter(
+            author__following__user=self.user, tags__slug='tag2',
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(response.data['count'], len(expected))
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            expected[:2])
+
+    @mock.patch('recipes.services.TIMELINE_LENGTH', 2)
+    def test_trim(self):
+        timeline = TimelineEntry.objects.filter(user=self.user).order_by(
+            '-pub_date', '-recipe_id').values_list('recipe_id', flat=True)
+        newest = timeline.first()
+        count = timeline.count()
+        # Рассылка не обрезает ленты
+        recipe = self.create_recipe(self.users[1])
+        self.assertEqual(timeline.count(), count + 1)
+        self.assertEqual(trim_timelines(), count - 1)
+        self.assertEqual(list(timeline), [recipe.id, newest])
+        self.assertEqual(trim_timelines(), 0)
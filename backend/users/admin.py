@@ -3,6 +3,39 @@ from django.contrib import admin
 from .models import User
 
 
+class CounterListFilter(admin.SimpleListFilter):
+    """Фильтр по диапазону значения счётчика"""
+    ranges = (
+        ('0', 'Нет', 0, 0),
+        ('1-10', 'От 1 до 10', 1, 10),
+        ('11-100', 'От 11 до 100', 11, 100),
+        ('100+', 'Больше 100', 101, None),
+    )
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, label, _, _ in self.ranges]
+
+    def queryset(self, request, queryset):
+        for value, _, low, high in self.ranges:
+            if self.value() == value:
+                queryset = queryset.filter(
+                    **{f'{self.parameter_name}__gte': low})
+                if high is not None:
+                    queryset = queryset.filter(
+                        **{f'{self.parameter_name}__lte': high})
+        return queryset
+
+
+class FollowersCountFilter(CounterListFilter):
+    title = 'Подписчики'
+    parameter_name = 'followers_count'
+
+
+class RecipesCountFilter(CounterListFilter):
+    title = 'Рецепты'
+    parameter_name = 'recipes_count'
+
+
 class UserAdmin(admin.ModelAdmin):
     list_display = (
         'username',
@@ -10,24 +43,21 @@ class UserAdmin(admin.ModelAdmin):
         'password',
         'first_name',
         'last_name',
-        'count_subscribe',
-        'count_recipe',
+        'followers_count',
+        'following_count',
+        'recipes_count',
     )
     readonly_fields = (
-        'count_subscribe',
-        'count_recipe',
+        'followers_count',
+        'following_count',
+        'recipes_count',
+    )
+    list_filter = (
+        'email',
+        'username',
+        FollowersCountFilter,
+        RecipesCountFilter,
     )
-    list_filter = ('email', 'username')
-
-    def count_subscribe(self, obj):
-        return obj.follower.count()
-
-    count_subscribe.short_description = 'Подписки'
-
-    def count_recipe(self, obj):
-        return obj.recipe.count()
-
-    count_recipe.short_description = 'Рецепты'
 
 
 admin.site.register(User, UserAdmin)
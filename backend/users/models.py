@@ -29,6 +29,21 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         max_length=LENGTH_FIELD,
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчики',
+        default=0,
+        editable=False,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписки',
+        default=0,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецепты',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('first_name',)